@@ -0,0 +1,40 @@
+import argparse
+
+import src.backtest as backtest
+import src.store as store
+
+parser = argparse.ArgumentParser(
+    description="Runs trading strategies over the whole history of every asset"
+)
+parser.add_argument(
+    "-s",
+    "--strategy",
+    action="append",
+    choices=sorted(backtest.STRATEGIES),
+    help="strategy to run, can be given more than once (default: all of them)",
+)
+parser.add_argument("-b", "--budget", type=float, default=1000000.0)
+parser.add_argument("-p", "--processes", type=int, default=None)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    results, throughput = backtest.run_many(
+        args.strategy or list(backtest.STRATEGIES),
+        [symbol for symbol, _, _ in store.ASSETS],
+        args.budget,
+        args.processes,
+    )
+
+    for result in results:
+        print(
+            f"{result.strategy:<18} {result.symbol:<5}"
+            f" | {result.trades:>6} trades"
+            f" | invested ${result.invested_money:>14.4f}"
+            f" | returned ${result.returned_money:>14.4f}"
+            f" | equity ${result.equity:>14.4f}"
+            f" | lowest balance ${result.lowest_balance:>14.4f}"
+        )
+
+    print(f"\n{sum(r.ticks for r in results)} ticks at {throughput:.0f} ticks/s")
@@ -0,0 +1,124 @@
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Frames get drawn into a window nobody sees
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+pygame.init()
+
+import src.benchmark as benchmark
+from src.persistence import Journal
+
+parser = argparse.ArgumentParser(
+    description="Times loading, price lookups and drawing, and compares them against"
+    " a saved baseline"
+)
+parser.add_argument(
+    "-k",
+    "--filter",
+    action="append",
+    help="only run the scenarios with this in their name, can be given more than once",
+)
+parser.add_argument("-n", "--repeat", type=int, default=5)
+parser.add_argument("-b", "--baseline", type=Path, default=benchmark.BASELINE_PATH)
+parser.add_argument(
+    "-t",
+    "--threshold",
+    type=float,
+    default=benchmark.THRESHOLD,
+    help="fraction something may get worse by before it counts (default: %(default)s)",
+)
+parser.add_argument(
+    "-u",
+    "--update",
+    action="store_true",
+    help="save the results as the new baseline (done anyway when there's none yet)",
+)
+parser.add_argument("-l", "--list", action="store_true", help="list the scenarios")
+
+# The simulator's saves are left alone, its journal goes here instead
+save_dir = tempfile.TemporaryDirectory()
+
+
+def frame(size, zoom):
+    # One whole frame of the simulator, every panel drawn from scratch. Without
+    # the banked time cleared and the panels made stale, how many frames get
+    # drawn again rather than reused would depend on how fast the machine is.
+    def setup():
+        import main
+
+        if main.chart is None:
+            main.journal = Journal(
+                main.portfolio, main.order_book, Path(save_dir.name) / "save"
+            )
+            main.setup()
+            main.fps = 0
+
+        main.window = pygame.display.set_mode(size, pygame.RESIZABLE)
+        main.zoom_back = zoom
+
+        def run():
+            main.sim_time = benchmark.START_TIME
+            main.scheduler.lag = 0.0
+            for panel in main.compositor.panels:
+                panel.invalidate()
+            main.compositor.invalidate()
+            main.chart.invalidate()
+            main.loop()
+
+        return run
+
+    return setup
+
+
+def progress(name: str, result: dict):
+    print(
+        f"{name:<40} {result['seconds'] * 1000:>10.3f} ms"
+        f" (best {result['best'] * 1000:>10.3f} ms)"
+        f" | peak {result['peak_bytes'] / 1024:>10.0f} KiB",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    scenarios = benchmark.scenarios()
+    for size in benchmark.WINDOW_SIZES:
+        for zoom in benchmark.ZOOMS:
+            scenarios[f"frame/{size[0]}x{size[1]}/{zoom}s"] = frame(size, zoom)
+
+    if args.filter:
+        scenarios = {
+            name: scenario
+            for name, scenario in scenarios.items()
+            if any(part in name for part in args.filter)
+        }
+
+    if args.list:
+        print("\n".join(scenarios))
+        sys.exit(0)
+
+    results = benchmark.run(scenarios, args.repeat, progress)
+    baseline = benchmark.load_baseline(args.baseline)
+
+    if baseline is None or args.update:
+        # Scenarios that weren't run this time keep their old numbers
+        benchmark.save_baseline({**(baseline or {}), **results}, args.baseline)
+        print(f"Saved the baseline to {args.baseline}")
+    else:
+        found = benchmark.regressions(results, baseline, args.threshold)
+        for name, problems in found.items():
+            print(f"REGRESSION {name}: {', '.join(problems)}")
+
+        print(
+            f"{len(found)} of {len(results)} scenarios regressed"
+            f" by more than {args.threshold:.0%}"
+        )
+        sys.exit(1 if found else 0)
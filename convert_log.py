@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import src.tradelog as tradelog
+
+
+# Converts old `<time>:{...},` trade logs into the JSON lines format, next to the
+# originals, e.g. `python convert_log.py visualizations/*.txt`
+for src in map(Path, sys.argv[1:]):
+    dst = src.with_suffix(".jsonl")
+    tradelog.convert(src, dst)
+    tradelog.index(dst)
+
+    print(f"{src} -> {dst}")
@@ -1,17 +1,27 @@
+import argparse
 import asyncio
 import math
 import platform
 import sys
-import json
-import os
 
 import pygame
 
 pygame.init()
 
 import src.utils as utils
-from src.asset import Asset, AssetType, STOCK_TIME_OFFSET
+import src.store as store
+import src.tradelog as tradelog
+from src.asset import NPZ_INTERVAL, STOCK_TIME_OFFSET
 from src.chart import Chart
+from src.equity import EquityCurve
+from src.orders import Order, OrderBook, OrderType
+from src.panel import Compositor, stack
+from src.persistence import Journal
+from src.portfolio import Portfolio
+from src.profiler import Profiler
+from src.replay import Replay
+from src.scheduler import Scheduler
+from src.watchlist import Watchlist
 
 
 ###########
@@ -21,22 +31,35 @@ from src.chart import Chart
 
 window = pygame.display.set_mode((800, 600), pygame.RESIZABLE)
 clock = pygame.time.Clock()
+scheduler = Scheduler()
+
+fps = 60
+IDLE_FPS = 5  # While minimized or in the background, when nothing gets drawn
+
+WHITE = (255, 255, 255)
+
+# Drawn in this order, each only when what it shows changes
+compositor = Compositor((5, 10, 48))
+panels = {
+    name: compositor.add()
+    for name in (
+        "balance",
+        "chart",
+        "price",
+        "info",
+        "details",
+        "prompt",
+        "cursor",
+        "watchlist",
+        "profiler",
+    )
+}
+profiler = Profiler()
 
-balance = 1000000
-assets = [
-    # The file names are ambigious, as we don't want the participants to know
-    # which stock/crypto they're trading with.
-    Asset("AAPL", AssetType.STOCK, utils.DIR / "assets" / "A.npz"),
-    Asset("AMZN", AssetType.STOCK, utils.DIR / "assets" / "B.npz"),
-    Asset("META", AssetType.STOCK, utils.DIR / "assets" / "C.npz"),
-    Asset("TSLA", AssetType.STOCK, utils.DIR / "assets" / "D.npz"),
-    Asset("TWTR", AssetType.STOCK, utils.DIR / "assets" / "E.npz"),
-    Asset("BTC", AssetType.CRYPTO, utils.DIR / "assets" / "F.npz"),
-    Asset("DOGE", AssetType.CRYPTO, utils.DIR / "assets" / "G.npz"),
-    Asset("ETH", AssetType.CRYPTO, utils.DIR / "assets" / "H.npz"),
-    Asset("LTC", AssetType.CRYPTO, utils.DIR / "assets" / "I.npz"),
-    Asset("XMR", AssetType.CRYPTO, utils.DIR / "assets" / "J.npz"),
-]
+assets = store.load_assets()
+portfolio = Portfolio(assets, 1000000)
+order_book = OrderBook(portfolio)
+journal = Journal(portfolio, order_book)
 
 sim_time = (
     3600 * 24 * 7 + STOCK_TIME_OFFSET
@@ -46,8 +69,25 @@ sim_speed = 1
 cur_asset = 0
 num_input = ""
 zoom_back = 128
+candles = False
+indicators = False
+watchlist_shown = False
+equity_view = False  # The portfolio's worth over time instead of the asset's price
 
 chart: Chart = None
+equity_chart: Chart = None
+equity: EquityCurve = None
+replay: Replay = None  # Set when playing back a trade log instead of trading
+watchlist = Watchlist(assets)
+
+# Lines drawn over the price when `indicators` is on, with windows in samples
+INDICATORS = [
+    (("bollinger_lower", 720, 2), (128, 128, 255, 128)),
+    (("bollinger_upper", 720, 2), (128, 128, 255, 128)),
+    (("sma", 720), (255, 255, 0, 255)),
+    (("ema", 120), (0, 255, 255, 255)),
+    (("session_average",), (255, 0, 255, 255)),
+]
 
 
 ##########################################
@@ -56,37 +96,39 @@ chart: Chart = None
 
 
 def save():
-    with open("save.json", "w") as f:
-        json.dump(
-            {
-                "balance": balance,
-                "time": sim_time,
-                "assets": {
-                    i: {
-                        "invested_money": asset.invested_money,
-                        "invested_amount": asset.invested_amount,
-                        "returned_money": asset.returned_money,
-                        "returned_amount": asset.returned_amount,
-                    }
-                    for i, asset in enumerate(assets)
-                },
-            },
-            f,
-        )
+    # A replay leaves the actual session alone
+    if replay is not None:
+        return
+
+    utils.flush_log()
+    journal.compact(sim_time)
 
 
 def load():
-    global balance, sim_time
+    global sim_time
 
-    with open("save.json", "r") as f:
-        di = json.load(f)
+    # Also picks up a `save.json` from before there were snapshots
+    if (saved_time := journal.load()) is not None:
+        sim_time = saved_time
 
-        balance = di["balance"]
-        sim_time = di["time"]
 
-        for i, asset in di["assets"].items():
-            for key, value in asset.items():
-                setattr(assets[int(i)], key, value)
+def parse_input():
+    # `num_input` is either an amount to trade right away, or `amount@price` for a
+    # limit or stop order. Gives the amount and price (None for the former).
+    amount, at, price = num_input.partition("@")
+
+    try:
+        return float(amount), float(price) if at else None
+    except ValueError:
+        return None, None
+
+
+def whole_amount(text: str) -> str:
+    # In case fractional input was provided earlier
+    amount, at, price = text.partition("@")
+    amount = str(int(float(amount))) if amount.strip(".") else ""
+
+    return amount + at + price
 
 
 ###################
@@ -95,7 +137,7 @@ def load():
 
 
 def setup():
-    global chart
+    global chart, equity_chart, equity, sim_time
 
     pygame.display.set_caption("Client Trading Simulator")
 
@@ -105,17 +147,63 @@ def setup():
         600,
         x_repr=lambda x: utils.to_time(x, zoom_back > 86400),
         y_repr=lambda y: f"${y:.2f}",
+        data_many_lambda=lambda xs: assets[cur_asset].price_many(xs),
+        envelope_lambda=lambda t0s, t1s: assets[cur_asset].envelope_many(t0s, t1s),
+        candle_lambda=lambda period, t0, t1: assets[cur_asset].candles_many(
+            period, t0, t1
+        ),
     )
+    chart.profiler = profiler
 
-    if os.path.isfile("save.json"):
+    if replay is None:
         load()
 
+        # Earlier sessions' trades come from the trade log, so the net worth before
+        # this one is what was really held back then
+        try:
+            records = list(tradelog.read(utils.LOG_PATH))
+        except (OSError, ValueError):
+            records = []
+        portfolio.ledger.add_records(assets, records)
+        equity = EquityCurve.ending_at(
+            assets, portfolio.ledger, portfolio.balance, portfolio.owned_amount
+        )
+    else:
+        sim_time = replay.start_time()
+        equity = EquityCurve(
+            assets, replay.ledger, replay.initial_balance, [0.0] * len(assets)
+        )
+
+    equity_chart = Chart(
+        equity.value,
+        800,
+        600,
+        x_repr=chart.x_repr,
+        y_repr=lambda y: f"${y:.2f}",
+        data_many_lambda=equity.value_many,
+    )
+    equity_chart.profiler = profiler
+
 
 def loop():
-    global balance, sim_time, sim_speed, cur_asset, num_input, zoom_back
+    global sim_time, sim_speed, cur_asset, num_input, zoom_back, candles, indicators
+    global watchlist_shown, equity_view
+
+    profiler.begin()
+
+    visible = pygame.display.get_active() and pygame.key.get_focused()
+    dt = clock.tick(fps if visible else IDLE_FPS) / 1000
+    profiler.lap("wait")
 
-    dt = clock.tick() / 1000
-    sim_time += dt * sim_speed
+    # Orders get every tick in between, however many steps that was
+    prev_time = sim_time
+    sim_time += scheduler.advance(dt) * scheduler.step * sim_speed
+    if replay is None:
+        order_book.update(prev_time, sim_time)
+        journal.checkpoint(sim_time)
+    else:
+        replay.seek(sim_time)
+    profiler.lap("simulation")
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -125,16 +213,36 @@ def loop():
             # Scroll through asset
             if event.key == pygame.K_UP:
                 cur_asset = (cur_asset + 1) % len(assets)
+                chart.invalidate()
 
-                # In case fractional input was provided earlier
-                if num_input and assets[cur_asset].is_stock():
-                    num_input = str(int(float(num_input)))
+                if assets[cur_asset].is_stock():
+                    num_input = whole_amount(num_input)
             elif event.key == pygame.K_DOWN:
                 cur_asset = (cur_asset - 1) % len(assets)
-
-                # In case fractional input was provided earlier
-                if num_input and assets[cur_asset].is_stock():
-                    num_input = str(int(float(num_input)))
+                chart.invalidate()
+
+                if assets[cur_asset].is_stock():
+                    num_input = whole_amount(num_input)
+            # Switch between the line and candle views
+            elif event.key == pygame.K_v:
+                candles = not candles
+            # Indicators over the price
+            elif event.key == pygame.K_i:
+                indicators = not indicators
+                chart.series = [
+                    (
+                        lambda xs, key=key: assets[cur_asset].indicator_many(key, xs),
+                        color,
+                    )
+                    for key, color in (INDICATORS if indicators else [])
+                ]
+                chart.invalidate()
+            # Net worth over time
+            elif event.key == pygame.K_e:
+                equity_view = not equity_view
+            # Every asset at once
+            elif event.key == pygame.K_w:
+                watchlist_shown = not watchlist_shown
             # Adjust simulation speed
             elif event.key == pygame.K_SPACE:
                 sim_speed = 1
@@ -144,179 +252,317 @@ def loop():
             elif event.key == pygame.K_RIGHT:
                 if sim_speed < 2**10:
                     sim_speed *= 2
+            # Jumping around a replay, by an hour or to either end
+            elif replay is not None and event.key in {
+                pygame.K_PAGEUP,
+                pygame.K_PAGEDOWN,
+                pygame.K_HOME,
+                pygame.K_END,
+            }:
+                sim_time = {
+                    pygame.K_PAGEUP: sim_time - 3600,
+                    pygame.K_PAGEDOWN: sim_time + 3600,
+                    pygame.K_HOME: replay.start_time(),
+                    pygame.K_END: replay.end_time(),
+                }[event.key]
+                replay.seek(sim_time)
             # `num_input`
             elif event.key == pygame.K_BACKSPACE:
                 num_input = num_input[:-1]
             elif event.unicode and ord("0") <= ord(event.unicode) <= ord("9"):
                 num_input += event.unicode
-            elif (
-                event.unicode in {".", ","}
-                and "." not in num_input
-                and assets[cur_asset].is_crypto()
+            elif event.unicode in {".", ","} and (
+                "." not in num_input.partition("@")[2]
+                if "@" in num_input
+                else "." not in num_input and assets[cur_asset].is_crypto()
             ):
                 num_input += "."
-            # Buy
-            elif num_input and event.key == pygame.K_b:
-                current_price = assets[cur_asset].price(sim_time)
-                if math.isnan(current_price):
-                    continue
-
-                amount = float(num_input)
-                total_price = current_price * amount
-
-                if total_price <= balance:
-                    balance -= total_price
-                    assets[cur_asset].buy(amount, sim_time)
-                    num_input = ""
-            # Sell
-            elif num_input and event.key == pygame.K_s:
-                current_return = assets[cur_asset].price(sim_time)
-                if math.isnan(current_return):
+            elif event.unicode == "@" and num_input and "@" not in num_input:
+                num_input += "@"
+            # Buy or sell, right away or at a price (Shift for a stop order)
+            elif replay is None and num_input and event.key in {pygame.K_b, pygame.K_s}:
+                amount, price = parse_input()
+                side = "buy" if event.key == pygame.K_b else "sell"
+
+                if amount is None:
                     continue
-
-                amount = float(num_input)
-                total_return = current_return * amount
-
-                if (
-                    amount
-                    <= assets[cur_asset].invested_amount
-                    - assets[cur_asset].returned_amount
-                ):
-                    balance += total_return
-                    assets[cur_asset].sell(amount, sim_time)
+                elif price is None:
+                    trade = portfolio.buy if side == "buy" else portfolio.sell
+                    if trade(cur_asset, amount, sim_time):
+                        num_input = ""
+                else:
+                    order_book.place(
+                        Order(
+                            cur_asset,
+                            side,
+                            OrderType.STOP
+                            if event.mod & pygame.KMOD_SHIFT
+                            else OrderType.LIMIT,
+                            amount,
+                            price,
+                        )
+                    )
                     num_input = ""
+            # Cancel the asset's open orders
+            elif replay is None and event.key == pygame.K_c:
+                order_book.cancel(cur_asset)
+            # Frame timings
+            elif event.key == pygame.K_F3:
+                profiler.toggle()
+            elif event.key == pygame.K_F4:
+                profiler.export()
         # Adjust zoom
         elif event.type == pygame.MOUSEWHEEL:
             zoom_back *= 2 ** int(-event.y)
             zoom_back = max(min(zoom_back, 2**20), 2**4)
 
-    window.fill((5, 10, 48))
+    profiler.lap("events")
 
-    # Balance
-    window.blit(
-        bal_text := utils.LARGE_FONT.render(
-            f"Balance: ${balance:.4f}", True, (255, 255, 255)
-        ),
+    if not visible:
+        compositor.invalidate()
+        return
+
+    width, height = window.get_size()
+    current_price = assets[cur_asset].price(sim_time)
+
+    # Balance, net worth and time
+    panels["balance"].update(
         (
-            window.get_width() * 0.95 - bal_text.get_width(),
-            window.get_height() * 0.95 - bal_text.get_height(),
+            f"Balance: ${portfolio.balance:.4f}",
+            f"Net worth: ${portfolio.value(sim_time):.4f}",
+            utils.to_time(sim_time, True),
         ),
-    )
-    window.blit(
-        dtime_text := utils.LARGE_FONT.render(
-            utils.to_time(sim_time, True), True, (255, 255, 255)
+        lambda: stack(
+            [
+                utils.render(utils.LARGE_FONT, utils.to_time(sim_time, True), WHITE),
+                utils.render(
+                    utils.SMALL_FONT,
+                    f"Net worth: ${portfolio.value(sim_time):.4f}",
+                    WHITE,
+                ),
+                utils.render(
+                    utils.LARGE_FONT, f"Balance: ${portfolio.balance:.4f}", WHITE
+                ),
+            ],
+            right=True,
         ),
+    )
+    panels["balance"].move(
         (
-            window.get_width() * 0.95 - dtime_text.get_width(),
-            window.get_height() * 0.95
-            - dtime_text.get_height()
-            - bal_text.get_height(),
-        ),
+            width * 0.95 - panels["balance"].surface.get_width(),
+            height * 0.95 - panels["balance"].surface.get_height(),
+        )
     )
 
+    profiler.lap("hud")
+
     # Chart
-    chart.scale_x_min = sim_time - zoom_back
-    chart.scale_x_max = sim_time
-    chart.width = int(window.get_width() * 0.9)
-    chart.height = int(window.get_height() * 0.5)
-    chart.adjust_scale()
-    chart.line_chart()
-    window.blit(chart.surface, (window.get_width() * 0.05, window.get_height() * 0.05))
+    chart_width = int(width * 0.9)
+    chart_height = int(height * 0.5)
+    # Once a column covers more than one sample, draw every column's full range
+    # instead of skipping over the samples in between
+    envelope = zoom_back / (chart_width - chart.y_margin) > NPZ_INTERVAL
+
+    # The chart (and whether its Y scale needs changing) can only change once a new
+    # column scrolled in, or when what it shows changed, not every frame
+    chart_key = (
+        math.floor(sim_time * (chart_width - chart.y_margin) / zoom_back),
+        zoom_back,
+        chart_width,
+        chart_height,
+        cur_asset,
+        candles,
+        indicators,
+        envelope,
+        equity_view,
+    )
+
+    def draw_chart():
+        if equity_view:
+            equity_chart.scale_x_min = sim_time - zoom_back
+            equity_chart.scale_x_max = sim_time
+            equity_chart.width = chart_width
+            equity_chart.height = chart_height
+
+            equity_chart.adjust_scale(sticky=True)
+            profiler.lap("adjust_scale")
+            equity_chart.scroll_chart()
+
+            return equity_chart.surface
+
+        chart.scale_x_min = sim_time - zoom_back
+        chart.scale_x_max = sim_time
+        chart.width = chart_width
+        chart.height = chart_height
+
+        if candles:
+            chart.adjust_scale(envelope=True)
+            profiler.lap("adjust_scale")
+            chart.candle_chart()
+        else:
+            chart.adjust_scale(envelope=envelope, sticky=True)
+            profiler.lap("adjust_scale")
+            chart.scroll_chart(envelope)
+
+        return chart.surface
+
+    panels["chart"].update(chart_key, draw_chart)
+    panels["chart"].move((width * 0.05, height * 0.05))
+    profiler.lap("chart")
 
     # Price
-    current_price = assets[cur_asset].price(sim_time)
-    window.blit(
-        text := utils.LARGE_FONT.render(
-            ("SIMULATION ENDED" if assets[cur_asset].has_ended(sim_time) else "CLOSED")
-            if math.isnan(current_price)
-            else f"${current_price:.4f}",
-            True,
-            (255, 255, 255),
-        ),
-        (window.get_width() * 0.95 - text.get_width(), window.get_height() * 0.05),
+    price_text = (
+        ("SIMULATION ENDED" if assets[cur_asset].has_ended(sim_time) else "CLOSED")
+        if math.isnan(current_price)
+        else f"${current_price:.4f}"
+    )
+    panels["price"].update(
+        price_text, lambda: utils.render(utils.LARGE_FONT, price_text, WHITE)
+    )
+    panels["price"].move(
+        (width * 0.95 - panels["price"].surface.get_width(), height * 0.05)
     )
 
     # Cursor info
     mouse_x, mouse_y = pygame.mouse.get_pos()
-    sel_time, sel_price = chart.at(mouse_x - window.get_width() * 0.05)
-    if not math.isnan(sel_time) and mouse_y < chart.height + window.get_height() * 0.05:
-        window.blit(
-            text := utils.SMALL_FONT.render(
-                f"{utils.to_time(sel_time, True)} | "
-                + (
-                    (
-                        "SIMULATION ENDED"
-                        if assets[cur_asset].has_ended(sel_time)
-                        else "CLOSED"
-                    )
-                    if math.isnan(sel_price)
-                    else f"${sel_price:.4f}"
-                ),
-                True,
-                (255, 255, 255),
-            ),
-            (mouse_x - text.get_width(), mouse_y),
+    shown = equity_chart if equity_view else chart
+    sel_time, sel_price = shown.at(mouse_x - width * 0.05)
+    if not math.isnan(sel_time) and mouse_y < shown.height + height * 0.05:
+        if not math.isnan(sel_price):
+            shown_price = f"${sel_price:.4f}"
+        elif equity_view:
+            shown_price = "SOMETHING HELD HAS NO PRICE"
+        elif assets[cur_asset].has_ended(sel_time):
+            shown_price = "SIMULATION ENDED"
+        else:
+            shown_price = "CLOSED"
+        cursor_text = f"{utils.to_time(sel_time, True)} | {shown_price}"
+        panels["cursor"].update(
+            cursor_text, lambda: utils.render(utils.SMALL_FONT, cursor_text, WHITE)
         )
+        panels["cursor"].move((mouse_x - panels["cursor"].surface.get_width(), mouse_y))
+    else:
+        panels["cursor"].update(None, lambda: None)
 
     # Info
-    window.blit(
-        text := utils.SMALL_FONT.render(
-            f"[{cur_asset + 1}] {assets[cur_asset].pseudonym} (U&D)"
-            f" | {sim_speed}s/s (L&R) | Zoom -{zoom_back} (Scroll)",
-            True,
-            (255, 255, 255),
-        ),
-        (window.get_width() * 0.05, window.get_height() * 0.05 + chart.height),
+    info_text = (
+        ("REPLAY | " if replay is not None else "")
+        + f"[{cur_asset + 1}] {assets[cur_asset].pseudonym} (U&D)"
+        f" | {sim_speed}s/s (L&R) | Zoom -{zoom_back} (Scroll)"
+        f" | {'Candles' if candles else 'Line'} (V)"
+        f" | Indicators {'on' if indicators else 'off'} (I)"
+        f" | {'Net worth' if equity_view else 'Price'} (E)"
     )
+    panels["info"].update(
+        info_text, lambda: utils.render(utils.SMALL_FONT, info_text, WHITE)
+    )
+    panels["info"].move((width * 0.05, height * 0.05 + chart_height))
 
     # Extra asset info
-    owned_amount = assets[cur_asset].invested_amount - assets[cur_asset].returned_amount
+    owned_amount = portfolio.owned_amount[cur_asset]
     total_delta = (
-        assets[cur_asset].returned_money
+        portfolio.returned_money[cur_asset]
         + owned_amount * current_price
-        - assets[cur_asset].invested_money
+        - portfolio.invested_money[cur_asset]
     )
 
-    lines = [
+    lines = (
         f"Asset symbol     : {assets[cur_asset].pseudonym}",
         f"Asset type       : {assets[cur_asset].asset_type.name}",
         f"Trading time     : {'-' if assets[cur_asset].has_ended(sim_time) else '9:00 - 15:30' if assets[cur_asset].is_stock() else '0:00 - 23:55'}",
         f"",
         f"Owned amount     : {owned_amount:.4f}",
-        f"Total investment : ${assets[cur_asset].invested_money:.4f}",
-        f"Sold return      : ${assets[cur_asset].returned_money:.4f}",
+        f"Total investment : ${portfolio.invested_money[cur_asset]:.4f}",
+        f"Sold return      : ${portfolio.returned_money[cur_asset]:.4f}",
         f"",
         f"Potential return : ${'UNAVAILABLE' if math.isnan(current_price) else f'{owned_amount * current_price:.4f}'}",
         f"Total delta      : -${-total_delta:.4f}"
         if total_delta < 0
         else f"Total delta      : +${'UNAVAILABLE' if math.isnan(total_delta) else f'{total_delta:.4f}'}",
-    ]
+        f"",
+        f"Open orders      : {len(order_book.open_orders(cur_asset))} (C to cancel)",
+    ) + tuple(
+        f"  {order.order_type.name.lower()} {order.side} {order.amount:.4f} @ ${order.price:.4f}"
+        for order in order_book.open_orders(cur_asset)[:5]
+    )
 
-    offset_y = window.get_height() * 0.05 + chart.height + text.get_height() * 2
-    for line in lines:
-        window.blit(
-            text := utils.SMALL_FONT.render(line, True, (255, 255, 255)),
-            (window.get_width() * 0.05, offset_y),
+    panels["details"].update(
+        lines,
+        lambda: stack([utils.render(utils.SMALL_FONT, line, WHITE) for line in lines]),
+    )
+    panels["details"].move(
+        (
+            width * 0.05,
+            height * 0.05 + chart_height + panels["info"].surface.get_height() * 2,
         )
-        offset_y += text.get_height()
+    )
 
     # Input for buying
     if num_input:
-        window.blit(
-            text := utils.SMALL_FONT.render(
+        amount, price = parse_input()
+        if price is not None:
+            prompt = (
+                f"Limit (B)uy or (S)ell '{amount}' amount of {assets[cur_asset].pseudonym}"
+                f" at ${price:.4f} (Shift for stop)"
+            )
+        else:
+            prompt = (
                 f"(B)uying or (S)elling '{num_input}' amount of {assets[cur_asset].pseudonym} "
                 + (
                     "(NOT AVAILABLE)"
-                    if math.isnan(current_price)
-                    else f"(${current_price * float(num_input):.4f})"
-                ),
-                True,
-                (255, 255, 255),
+                    if amount is None or math.isnan(current_price)
+                    else f"(${current_price * amount:.4f})"
+                )
+            )
+
+        panels["prompt"].update(
+            prompt, lambda: utils.render(utils.SMALL_FONT, prompt, WHITE)
+        )
+        panels["prompt"].move(
+            (width * 0.05, height * 0.95 - panels["prompt"].surface.get_height())
+        )
+    else:
+        panels["prompt"].update(None, lambda: None)
+
+    profiler.lap("hud")
+
+    # Watchlist, over the right side of the chart
+    if watchlist_shown:
+        panels["watchlist"].update(
+            (sim_time // NPZ_INTERVAL, cur_asset),
+            lambda: watchlist.render(sim_time, cur_asset),
+        )
+        panels["watchlist"].move(
+            (
+                width * 0.95 - panels["watchlist"].surface.get_width(),
+                height * 0.05 + panels["price"].surface.get_height(),
+            )
+        )
+    else:
+        panels["watchlist"].update(None, lambda: None)
+
+    profiler.lap("watchlist")
+
+    # Frame timings, a few times a second. Not through `utils.render()`, as the
+    # numbers hardly ever come out the same twice.
+    if profiler.enabled:
+        panels["profiler"].update(
+            profiler.frames // 15,
+            lambda: stack(
+                [
+                    utils.SMALL_FONT.render(line, True, WHITE, (0, 0, 0))
+                    for line in profiler.lines()
+                ]
             ),
-            (window.get_width() * 0.05, window.get_height() * 0.95 - text.get_height()),
         )
+        panels["profiler"].move((width * 0.05 + chart.y_margin + 8, height * 0.05 + 8))
+    else:
+        panels["profiler"].update(None, lambda: None)
 
-    pygame.display.flip()
+    profiler.lap("profiler")
+    compositor.present(window)
+    profiler.lap("present")
+    profiler.end()
 
 
 ##########################
@@ -344,5 +590,25 @@ async def main():
         await asyncio.sleep(0)
 
 
+parser = argparse.ArgumentParser(description="Client Trading Simulator")
+parser.add_argument(
+    "--fps", type=int, default=fps, help="frame rate cap (default: %(default)s)"
+)
+parser.add_argument(
+    "--replay",
+    metavar="LOG",
+    help="play back a trade log instead of trading (PgUp/PgDn/Home/End to jump)",
+)
+
+
 if __name__ == "__main__":
+    args = parser.parse_args()
+    fps = args.fps
+
+    if args.replay:
+        replay = Replay.from_log(assets, args.replay)
+        # Nothing of the actual session is touched: no orders, nothing saved
+        portfolio = replay.portfolio
+        order_book = OrderBook(portfolio)
+        journal = None
     asyncio.run(main())
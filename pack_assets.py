@@ -0,0 +1,14 @@
+import src.store as store
+
+
+# Packs the `assets/*.npz` archives into the memory-mapped store that the other
+# scripts load from. They do this on their own whenever the store is missing or
+# out of date, so running this by hand is only needed to prepare a read-only copy.
+assets = store.load_npz()
+store.pack(assets)
+
+for entry in store.read_header()["assets"]:
+    print(
+        f"{entry['symbol']}: {len(entry['day_lengths'])} days, {entry['count']} prices"
+    )
+print(f"Written to {store.STORE_PATH}")
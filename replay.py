@@ -0,0 +1,54 @@
+import argparse
+from pathlib import Path
+
+import src.store as store
+import src.utils as utils
+from src.replay import Replay
+
+parser = argparse.ArgumentParser(
+    description="Plays back a trade log without the UI, printing the portfolio as it"
+    " goes (run `main.py --replay LOG` to watch it instead)"
+)
+parser.add_argument("log", type=Path)
+parser.add_argument(
+    "-i",
+    "--interval",
+    type=float,
+    default=3600 * 24,
+    help="sim seconds between lines (default: a day)",
+)
+parser.add_argument(
+    "-t", "--at", type=float, action="append", help="only print these sim times"
+)
+parser.add_argument("-b", "--balance", type=float, default=1000000.0)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    assets = store.load_assets()
+    replay = Replay.from_log(assets, args.log, balance=args.balance)
+
+    if args.at:
+        ts = args.at
+    else:
+        start, end = replay.start_time(), replay.end_time()
+        ts = [
+            start + i * args.interval
+            for i in range(int((end - start) // args.interval) + 1)
+        ]
+        ts.append(end)
+
+    for t in ts:
+        replay.seek(t)
+        portfolio = replay.portfolio
+        owned = {
+            asset.symbol: amount
+            for asset, amount in zip(assets, portfolio.owned_amount.tolist())
+            if amount
+        }
+
+        print(
+            f"{utils.to_time(t, True)} | {replay.position:>6} trades"
+            f" | balance ${portfolio.balance:>14.4f}"
+            f" | net worth ${portfolio.value(t):>14.4f} | {owned}"
+        )
@@ -0,0 +1,151 @@
+import csv
+import hashlib
+import json
+import math
+import warnings
+from pathlib import Path
+from typing import Dict, List
+
+import numpy
+
+from . import utils
+from .asset import NPZ_INTERVAL, SLOTS_PER_DAY, STOCK_TIME_OFFSET, Asset
+
+
+# Crypto is only looked at over the same window the stocks are traded in, which is
+# this many samples from the stocks' opening hour (the shortest stock day)
+SESSION_SAMPLES = 4656
+
+# Per day: how many samples there were, the standard deviation of the prices over
+# their mean, the return from the first to the last price, the range between the
+# lowest and highest price over the mean, and the largest drop from a high
+COLUMNS = ("samples", "volatility", "return", "range", "drawdown")
+
+CACHE_VERSION = 1
+
+
+def file_hash(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def sessions(asset: Asset) -> numpy.ndarray:
+    # The prices of every day's session, one row per day, NaN where there's none
+    grid = asset.grid.reshape(len(asset.days), SLOTS_PER_DAY)
+
+    if asset.is_stock():
+        return grid[:, : asset.day_lengths.max()]
+    else:
+        start = STOCK_TIME_OFFSET // NPZ_INTERVAL
+        return grid[:, start : start + SESSION_SAMPLES]
+
+
+def day_stats(asset: Asset) -> Dict[str, numpy.ndarray]:
+    # Every column of `COLUMNS` for every day, all days at once
+    prices = sessions(asset)
+    valid = ~numpy.isnan(prices)
+    samples = valid.sum(axis=1)
+    rows = numpy.arange(len(prices))
+
+    # Days without any prices come out as NaN
+    with warnings.catch_warnings(), numpy.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        mean = numpy.nanmean(prices, axis=1)
+        volatility = numpy.nanstd(prices / mean[:, None], axis=1, ddof=1)
+
+        first = prices[rows, numpy.argmax(valid, axis=1)]
+        last = prices[rows, prices.shape[1] - 1 - numpy.argmax(valid[:, ::-1], axis=1)]
+
+        highs = numpy.fmax.accumulate(prices, axis=1)
+        drawdown = numpy.nanmax(1 - prices / highs, axis=1)
+
+        return {
+            "samples": samples,
+            "volatility": volatility,
+            "return": numpy.where(samples > 0, last / first - 1, math.nan),
+            "range": (numpy.nanmax(prices, axis=1) - numpy.nanmin(prices, axis=1))
+            / mean,
+            "drawdown": drawdown,
+        }
+
+
+def cached_day_stats(asset: Asset) -> Dict[str, numpy.ndarray]:
+    # `day_stats()`, kept next to the other caches for as long as the asset's file
+    # stays the same
+    path = utils.CACHE_DIR / f"{Path(asset.path).stem}.analytics.npz"
+    digest = file_hash(asset.path)
+
+    try:
+        with numpy.load(path) as npz:
+            if npz["hash"] == digest and npz["version"] == CACHE_VERSION:
+                return {column: npz[column] for column in COLUMNS}
+    except (OSError, ValueError, KeyError):
+        pass
+
+    stats = day_stats(asset)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            numpy.savez(f, hash=digest, version=CACHE_VERSION, **stats)
+        tmp.replace(path)
+    except OSError:
+        pass
+
+    return stats
+
+
+def rolling_volatility(asset: Asset, window=720) -> numpy.ndarray:
+    # Standard deviation of the log returns between consecutive prices over the
+    # last `window` samples, for every sample of `asset.prices`, by prefix sums
+    prices = numpy.asarray(asset.prices)
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        returns = numpy.diff(numpy.log(prices), prepend=math.nan)
+
+    valid = ~numpy.isnan(returns)
+    returns = numpy.where(valid, returns, 0.0)
+
+    sums = numpy.concatenate(([0.0], numpy.cumsum(returns)))
+    squares = numpy.concatenate(([0.0], numpy.cumsum(returns**2)))
+    counts = numpy.concatenate(([0], numpy.cumsum(valid)))
+
+    ends = numpy.arange(1, len(prices) + 1)
+    starts = numpy.maximum(ends - window, 0)
+    n = counts[ends] - counts[starts]
+
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        mean = (sums[ends] - sums[starts]) / n
+        variance = ((squares[ends] - squares[starts]) - n * mean**2) / (n - 1)
+
+    return numpy.where(n > 1, numpy.sqrt(numpy.maximum(variance, 0.0)), math.nan)
+
+
+def table(assets: List[Asset]) -> List[dict]:
+    # One row per asset and day, with every column of `COLUMNS`
+    rows = []
+    for asset in assets:
+        stats = cached_day_stats(asset)
+        for day in range(len(asset.days)):
+            rows.append(
+                {
+                    "symbol": asset.symbol,
+                    "day": day,
+                    **{column: stats[column][day].item() for column in COLUMNS},
+                }
+            )
+
+    return rows
+
+
+def export(rows: List[dict], path: Path):
+    # As CSV or JSON, going by the file's extension
+    path = Path(path)
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if path.suffix == ".json":
+            json.dump(rows, f)
+        else:
+            writer = csv.DictWriter(f, ["symbol", "day", *COLUMNS])
+            writer.writeheader()
+            writer.writerows(rows)
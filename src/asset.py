@@ -1,14 +1,19 @@
 import enum
 import math
 from pathlib import Path
+from typing import Optional, Tuple
 
 import numpy
 
 from . import utils
+from .candles import Candles
+from .indicators import Indicators
+from .pyramid import Pyramid
 
 
 NPZ_INTERVAL = 5  # 5 seconds
 STOCK_TIME_OFFSET = 3600 * 9  # Opening time is set at 9AM
+SLOTS_PER_DAY = 86400 // NPZ_INTERVAL
 
 
 class AssetType(enum.Enum):
@@ -17,18 +22,43 @@ class AssetType(enum.Enum):
 
 
 class Asset:
-    def __init__(self, symbol: str, asset_type: AssetType, path: Path):
+    def __init__(
+        self,
+        symbol: str,
+        asset_type: AssetType,
+        path: Path,
+        prices: Optional[numpy.ndarray] = None,
+        day_offsets: Optional[numpy.ndarray] = None,
+    ):
         self.symbol = symbol
         self.asset_type = asset_type
         self.path = path
 
-        npz = numpy.load(path)
-        self.days = [npz.get(f) for f in sorted(npz.files)]
+        # `prices` and `day_offsets` may be handed over directly (e.g. mapped from
+        # the packed store), otherwise the `.npz` at `path` is decompressed.
+        if prices is None:
+            npz = numpy.load(path)
+            days = [npz.get(f) for f in sorted(npz.files)]
 
-        self.invested_money = 0
-        self.invested_amount = 0
-        self.returned_money = 0
-        self.returned_amount = 0
+            prices = numpy.concatenate(days)
+            day_offsets = numpy.zeros(len(days) + 1, dtype=numpy.int64)
+            numpy.cumsum([len(day) for day in days], out=day_offsets[1:])
+
+        # All days live back to back in one contiguous array, where day `i` spans
+        # `prices[day_offsets[i]:day_offsets[i + 1]]`.
+        self.prices = prices
+        self.day_offsets = numpy.asarray(day_offsets, dtype=numpy.int64)
+        self.day_lengths = numpy.diff(self.day_offsets)
+        self.days = [
+            self.prices[self.day_offsets[i] : self.day_offsets[i + 1]]
+            for i in range(len(self.day_lengths))
+        ]
+
+        self._grid = None
+        self._filled = None
+        self._pyramid = None
+        self._candles = {}
+        self._indicators = None
 
     def is_stock(self) -> bool:
         return self.asset_type == AssetType.STOCK
@@ -48,43 +78,197 @@ class Asset:
         t = int(t % 86400) // NPZ_INTERVAL
 
         if 0 <= day < len(self.days):
-            if 0 <= t < len(self.days[day]):
-                return self.days[day][t]
+            if 0 <= t < self.day_lengths[day]:
+                return self.prices[self.day_offsets[day] + t]
             else:
                 return math.nan
         else:
             return math.nan
 
-    def has_ended(self, t: float) -> bool:
+    # Index into `prices` for every timestamp of `ts`, or -1 where there's no sample
+    def indices(self, ts: numpy.ndarray) -> numpy.ndarray:
+        ts = numpy.asarray(ts, dtype=numpy.float64)
         if self.is_stock():
-            t -= STOCK_TIME_OFFSET
+            ts = ts - STOCK_TIME_OFFSET
 
-        return t // 86400 >= len(self.days)
+        valid = ~numpy.isnan(ts)
+        ts = numpy.where(valid, ts, 0.0)
+
+        day = (ts // 86400).astype(numpy.int64)
+        slot = (ts % 86400).astype(numpy.int64) // NPZ_INTERVAL
+
+        valid &= (0 <= day) & (day < len(self.days))
+        day = numpy.where(valid, day, 0)
+        valid &= slot < self.day_lengths[day]
 
-    def buy(self, amount: float, t: float):
-        price = self.price(t)
+        return numpy.where(valid, self.day_offsets[day] + slot, -1)
 
-        self.invested_money += amount * price
-        self.invested_amount += amount
+    def price_many(self, ts: numpy.ndarray) -> numpy.ndarray:
+        indices = self.indices(ts)
+        return numpy.where(indices >= 0, self.prices[indices], math.nan)
 
-        utils.log(
-            time=t,
-            symbol=self.symbol,
-            action="buy",
-            amount=amount,
-            balance=amount * price,
+    # Index into `prices` of the last sample at or before every timestamp of `ts`,
+    # or -1 where there's none yet
+    def last_indices(self, ts: numpy.ndarray) -> numpy.ndarray:
+        ts = numpy.asarray(ts, dtype=numpy.float64)
+        if self.is_stock():
+            ts = ts - STOCK_TIME_OFFSET
+
+        valid = ~numpy.isnan(ts)
+        ts = numpy.where(valid, ts, 0.0)
+
+        day = (ts // 86400).astype(numpy.int64)
+        slot = (ts % 86400).astype(numpy.int64) // NPZ_INTERVAL
+
+        # Past the end of a day it's that day's last sample
+        clipped = numpy.clip(day, 0, len(self.days) - 1)
+        indices = self.day_offsets[clipped] + numpy.minimum(
+            slot, self.day_lengths[clipped] - 1
         )
+        indices = numpy.where(day >= len(self.days), len(self.prices) - 1, indices)
+        valid &= day >= 0
+
+        return numpy.where(valid, numpy.maximum(indices, -1), -1)
+
+    # Timestamp of every sample at `indices` into `prices`
+    def times(self, indices: numpy.ndarray) -> numpy.ndarray:
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        day = numpy.searchsorted(self.day_offsets, indices, side="right") - 1
+
+        ts = day * 86400 + (indices - self.day_offsets[day]) * NPZ_INTERVAL
+        return ts + STOCK_TIME_OFFSET if self.is_stock() else ts
+
+    @property
+    def filled(self) -> numpy.ndarray:
+        # `prices` with every NaN replaced by the last price before it
+        if self._filled is None:
+            last = numpy.where(
+                numpy.isnan(self.prices), -1, numpy.arange(len(self.prices))
+            )
+            numpy.maximum.accumulate(last, out=last)
+            self._filled = numpy.where(last >= 0, self.prices[last], math.nan)
+
+        return self._filled
+
+    def last_price_many(self, ts: numpy.ndarray) -> numpy.ndarray:
+        # Last known price at or before every timestamp of `ts`, so also while the
+        # market is closed, or NaN before the very first sample
+        indices = self.last_indices(ts)
+        return numpy.where(indices >= 0, self.filled[indices], math.nan)
+
+    def last_price(self, t: float) -> float:
+        # Same as `last_price_many()` for a single timestamp, without going through
+        # arrays
+        if self.is_stock():
+            t -= STOCK_TIME_OFFSET
+        if not t >= 0:
+            return math.nan
+
+        day = int(t // 86400)
+        if day >= len(self.days):
+            index = len(self.prices) - 1
+        else:
+            slot = int(t % 86400) // NPZ_INTERVAL
+            index = int(self.day_offsets[day]) + min(
+                slot, int(self.day_lengths[day]) - 1
+            )
 
-    def sell(self, amount: float, t: float):
-        price = self.price(t)
+        return float(self.filled[index]) if index >= 0 else math.nan
 
-        self.returned_money += amount * price
-        self.returned_amount += amount
+    @property
+    def indicators(self) -> Indicators:
+        if self._indicators is None:
+            self._indicators = Indicators(self.prices, self.day_offsets)
+
+        return self._indicators
+
+    def indicator_many(self, key: Tuple, ts: numpy.ndarray) -> numpy.ndarray:
+        # Indicator `key` (see `Indicators`) at every timestamp of `ts`, worked out
+        # through the last day any of them falls on
+        indices = self.indices(ts)
+        if (indices >= 0).any():
+            self.indicators.extend(int(indices.max()))
+
+        series = self.indicators.series(*key)
+        return numpy.where(indices >= 0, series[indices], math.nan)
+
+    @property
+    def grid(self) -> numpy.ndarray:
+        # Every `NPZ_INTERVAL` slot from the start of day 0 (after the stock offset),
+        # with NaN wherever there's no sample
+        if self._grid is None:
+            slots = numpy.repeat(
+                numpy.arange(len(self.days)) * SLOTS_PER_DAY - self.day_offsets[:-1],
+                self.day_lengths,
+            ) + numpy.arange(len(self.prices))
+
+            self._grid = numpy.full(len(self.days) * SLOTS_PER_DAY, math.nan)
+            self._grid[slots] = self.prices
+
+        return self._grid
+
+    @property
+    def pyramid(self) -> Pyramid:
+        if self._pyramid is None:
+            # Quicker to build than it would be to read back from disk
+            self._pyramid = Pyramid.build(self.grid)
+
+        return self._pyramid
+
+    def envelope_many(
+        self, t0s: numpy.ndarray, t1s: numpy.ndarray
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        # Open, low, high and close of every sample in [t0, t1), for each pair
+        t0s = numpy.asarray(t0s, dtype=numpy.float64)
+        t1s = numpy.asarray(t1s, dtype=numpy.float64)
+        if self.is_stock():
+            t0s = t0s - STOCK_TIME_OFFSET
+            t1s = t1s - STOCK_TIME_OFFSET
 
-        utils.log(
-            time=t,
-            symbol=self.symbol,
-            action="sell",
-            amount=amount,
-            balance=amount * price,
+        return self.pyramid.query(
+            numpy.floor(t0s / NPZ_INTERVAL), numpy.ceil(t1s / NPZ_INTERVAL)
         )
+
+    def candles(self, period: int) -> Candles:
+        # Candles of `period` seconds (rounded up to whole samples), starting from
+        # the beginning of day 0
+        slots = max(math.ceil(period / NPZ_INTERVAL), 1)
+        if slots not in self._candles:
+            self._candles[slots] = Candles(self.grid, slots)
+
+        return self._candles[slots]
+
+    def candles_many(
+        self, period: int, t0: float, t1: float
+    ) -> Tuple[numpy.ndarray, ...]:
+        # Start time, open, low, high and close of every candle overlapping [t0, t1).
+        # The last one only covers the samples up to `price(t1)`, as if the data
+        # ended there, so it doesn't give away prices that come after.
+        candles = self.candles(period)
+        period = candles.slots * NPZ_INTERVAL
+        offset = STOCK_TIME_OFFSET if self.is_stock() else 0
+
+        first = math.floor((t0 - offset) / period)
+        last = math.ceil((t1 - offset) / period)
+        opens, lows, highs, closes = candles.query(first, last)
+
+        first = max(first, 0)
+        end = math.floor((t1 - offset) / NPZ_INTERVAL) + 1  # Grid slots seen by t1
+        current = first + len(opens) - 1
+        if len(opens) and current * candles.slots < end < (current + 1) * candles.slots:
+            opens, lows, highs, closes = (
+                numpy.concatenate((a[:-1], b))
+                for a, b in zip(
+                    (opens, lows, highs, closes),
+                    self.pyramid.query([current * candles.slots], [end]),
+                )
+            )
+
+        times = (numpy.arange(len(opens)) + first) * period + offset
+        return times, opens, lows, highs, closes
+
+    def has_ended(self, t: float) -> bool:
+        if self.is_stock():
+            t -= STOCK_TIME_OFFSET
+
+        return t // 86400 >= len(self.days)
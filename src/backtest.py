@@ -0,0 +1,219 @@
+import functools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy
+
+from . import store
+from .asset import Asset
+
+
+# A strategy looks at an asset's whole price history (`Asset.prices`, NaN where
+# there's no price), the money it has to work with and whether only whole units can
+# be held (stocks), and returns how much of the asset it wants to be holding after
+# every tick. They're plain functions, so they can be shipped to worker processes,
+# and get configured with `functools.partial`.
+Strategy = Callable[[numpy.ndarray, float, bool], numpy.ndarray]
+
+
+def _ffill(a: numpy.ndarray, valid: numpy.ndarray, initial=0.0) -> numpy.ndarray:
+    # Carries the last valid value of `a` over the invalid ones
+    last = numpy.where(valid, numpy.arange(len(a)), -1)
+    numpy.maximum.accumulate(last, out=last)
+    return numpy.where(last >= 0, a[last], initial)
+
+
+def _moving_average(prices: numpy.ndarray, window: int) -> numpy.ndarray:
+    # Average over the last `window` ticks, skipping NaNs, by prefix sums
+    valid = ~numpy.isnan(prices)
+    sums = numpy.concatenate(([0.0], numpy.cumsum(numpy.where(valid, prices, 0.0))))
+    counts = numpy.concatenate(([0], numpy.cumsum(valid)))
+
+    ends = numpy.arange(1, len(prices) + 1)
+    starts = numpy.maximum(ends - window, 0)
+    with numpy.errstate(invalid="ignore", divide="ignore"):
+        return (sums[ends] - sums[starts]) / (counts[ends] - counts[starts])
+
+
+def _entries(
+    signal: numpy.ndarray, prices: numpy.ndarray, budget: float, whole: bool
+) -> numpy.ndarray:
+    # Puts all the money into the asset whenever `signal` comes on and takes it all
+    # out again when it goes off, so whatever was made or lost carries over into the
+    # next holding. The signal can only change on ticks that have a price. With
+    # `whole`, only whole units get bought and the change is kept as cash, so every
+    # holding is sized from money the account really has.
+    valid = ~numpy.isnan(prices)
+    signal = _ffill(signal, valid, False).astype(bool)
+
+    edges = numpy.diff(signal.astype(numpy.int8), prepend=0, append=0)
+    starts = numpy.flatnonzero(edges == 1)
+    ends = numpy.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return numpy.zeros(len(prices))
+
+    growth = prices[ends[:-1]] / prices[starts[:-1]]
+    money = budget * numpy.cumprod(numpy.concatenate(([1.0], growth)))
+    amounts = money / prices[starts]
+
+    if whole:
+        # What's left of the money after each holding depends on how many whole
+        # units the ones before it got, so the fills are worked out again from the
+        # cash they leave until nothing changes. Every round gets at least one more
+        # of them right, and it rarely takes more than a few.
+        gains = prices[ends[:-1]] - prices[starts[:-1]]
+        amounts = numpy.floor(amounts)
+        while True:
+            cash = budget + numpy.concatenate(
+                ([0.0], numpy.cumsum(amounts[:-1] * gains))
+            )
+            fills = numpy.floor(cash / prices[starts])
+            fills -= fills * prices[starts] > cash  # Rounded up on the way
+            if numpy.array_equal(fills, amounts):
+                break
+            amounts = fills
+
+    holding = numpy.cumsum(edges[:-1] == 1) - 1
+    return numpy.where(signal, amounts[holding], 0.0)
+
+
+def buy_and_hold(prices: numpy.ndarray, budget: float, whole: bool) -> numpy.ndarray:
+    return _entries(numpy.ones(len(prices), dtype=bool), prices, budget, whole)
+
+
+def moving_average_crossover(
+    prices: numpy.ndarray, budget: float, whole: bool, fast=60, slow=720
+) -> numpy.ndarray:
+    with numpy.errstate(invalid="ignore"):
+        signal = _moving_average(prices, fast) > _moving_average(prices, slow)
+
+    return _entries(signal, prices, budget, whole)
+
+
+def mean_reversion(
+    prices: numpy.ndarray, budget: float, whole: bool, window=720, threshold=0.01
+) -> numpy.ndarray:
+    # Buys when the price dips `threshold` below its moving average, and sells once
+    # it's back above it
+    average = _moving_average(prices, window)
+
+    with numpy.errstate(invalid="ignore"):
+        enter = prices < average * (1 - threshold)
+        leave = prices > average
+
+    # Holding from every enter until the next leave
+    events = numpy.where(enter, 1.0, numpy.where(leave, 0.0, numpy.nan))
+    signal = _ffill(events, ~numpy.isnan(events)) == 1.0
+
+    return _entries(signal, prices, budget, whole)
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    "buy_and_hold": buy_and_hold,
+    "ma_crossover": moving_average_crossover,
+    "ma_crossover_fast": functools.partial(moving_average_crossover, fast=12, slow=120),
+    "mean_reversion": mean_reversion,
+}
+
+
+class Result:
+    def __init__(self, strategy: str, symbol: str, ticks: int):
+        self.strategy = strategy
+        self.symbol = symbol
+        self.ticks = ticks
+
+        # Same bookkeeping as `Portfolio`, for the one asset
+        self.invested_money = 0.0
+        self.invested_amount = 0.0
+        self.returned_money = 0.0
+        self.returned_amount = 0.0
+
+        self.trades = 0
+        self.balance = 0.0
+        self.lowest_balance = 0.0
+        self.equity = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def owned_amount(self) -> float:
+        return self.invested_amount - self.returned_amount
+
+
+def run(
+    asset: Asset, strategy: Strategy, budget=1000000.0, name: Optional[str] = None
+) -> Result:
+    start = time.perf_counter()
+    prices = numpy.asarray(asset.prices)
+    result = Result(
+        name or getattr(strategy, "__name__", "?"), asset.symbol, len(prices)
+    )
+
+    # Orders can only go through while there's a price, otherwise the position
+    # stays as it was. Stocks only trade in whole shares.
+    tradable = ~numpy.isnan(prices)
+    target = numpy.asarray(
+        strategy(prices, budget, asset.is_stock()), dtype=numpy.float64
+    )
+    target = _ffill(numpy.nan_to_num(target), tradable)
+    if asset.is_stock():
+        target = numpy.floor(target)
+
+    trades = numpy.diff(target, prepend=0.0)
+    bought = numpy.maximum(trades, 0.0)
+    sold = numpy.maximum(-trades, 0.0)
+    fill_prices = numpy.where(tradable, prices, 0.0)
+
+    result.invested_amount = float(bought.sum())
+    result.invested_money = float((bought * fill_prices).sum())
+    result.returned_amount = float(sold.sum())
+    result.returned_money = float((sold * fill_prices).sum())
+    result.trades = int(numpy.count_nonzero(trades))
+
+    balance = budget + numpy.cumsum((sold - bought) * fill_prices)
+    result.balance = float(balance[-1]) if len(balance) else budget
+    result.lowest_balance = float(balance.min()) if len(balance) else budget
+
+    last_price = prices[tradable][-1] if tradable.any() else math.nan
+    result.equity = result.balance + result.owned_amount * last_price
+    result.elapsed = time.perf_counter() - start
+
+    return result
+
+
+_worker_assets: Dict[str, Asset] = {}
+
+
+def _init_worker():
+    # Each worker maps the asset store once; the pages are shared between them
+    _worker_assets.update((asset.symbol, asset) for asset in store.load_assets())
+
+
+def _run_job(job: Tuple[str, str, float]) -> Result:
+    name, symbol, budget = job
+    return run(_worker_assets[symbol], STRATEGIES[name], budget, name)
+
+
+def run_many(
+    strategies: List[str],
+    symbols: List[str],
+    budget=1000000.0,
+    processes: Optional[int] = None,
+) -> Tuple[List[Result], float]:
+    # Every strategy on every asset, spread over a pool of processes. Returns the
+    # results and the throughput in simulated ticks per second.
+    jobs = [(name, symbol, budget) for name in strategies for symbol in symbols]
+
+    # Brought up to date here, so the workers don't all go repacking it at once
+    store.load_assets()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=processes or os.cpu_count(), initializer=_init_worker
+    ) as pool:
+        results = list(pool.map(_run_job, jobs))
+    elapsed = time.perf_counter() - start
+
+    return results, sum(result.ticks for result in results) / elapsed
@@ -0,0 +1,270 @@
+import functools
+import gc
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy
+
+from . import store, utils, visualization
+from .asset import NPZ_INTERVAL, STOCK_TIME_OFFSET, Asset
+from .chart import Chart
+
+
+VERSION = 1
+BASELINE_PATH = utils.DIR / "benchmark.json"
+
+# Anything that got slower (or used more memory) by more than this fraction since
+# the baseline is a regression. Memory also has to grow by at least `MEMORY_SLACK`
+# bytes, so small allocations coming and going don't count.
+THRESHOLD = 0.25
+MEMORY_SLACK = 64 * 1024
+
+# Each timing repeats the scenario for at least this long, and the median of
+# `repeat` of those is what's kept
+MIN_TIME = 0.05
+
+# The same starting point as the simulator, and the windows and zoom levels (in
+# seconds shown) its frames get drawn at
+START_TIME = 3600 * 24 * 7 + STOCK_TIME_OFFSET
+WINDOW_SIZES = [(800, 600), (1920, 1080)]
+ZOOMS = [128, 3600, 3600 * 24 * 3]
+
+# A scenario sets everything up and returns the function that gets measured
+Scenario = Callable[[], Callable[[], None]]
+
+
+@functools.lru_cache(maxsize=None)
+def _assets() -> List[Asset]:
+    return store.load_assets()
+
+
+def _evict(paths: List[Path]):
+    # Drops the files from the page cache, so they get read from disk again. Only
+    # pages nothing has mapped can go, which rules out the packed store.
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def _load_npz() -> Callable[[], None]:
+    # From the compressed archives, as when the packed store is out of date. They're
+    # in the page cache after the first call.
+    return store.load_npz
+
+
+def _load_npz_cold() -> Callable[[], None]:
+    # Same, but with the archives read from disk every time
+    paths = [utils.DIR / "assets" / file for _, _, file in store.ASSETS]
+
+    def call():
+        _evict(paths)
+        store.load_npz()
+
+    return call
+
+
+def _load_store() -> Callable[[], None]:
+    store.load_assets()
+    return store.load_assets
+
+
+def _price(many: bool) -> Scenario:
+    def setup():
+        asset = _assets()[0]
+        ts = START_TIME + numpy.arange(10000) * (NPZ_INTERVAL / 2)
+
+        if many:
+            return lambda: asset.price_many(ts)
+        else:
+            ts = ts.tolist()
+            return lambda: [asset.price(t) for t in ts]
+
+    return setup
+
+
+def _chart(size: Tuple[int, int], zoom: int, method: str) -> Scenario:
+    # The simulator's chart, sized the way it is in a window of `size`
+    def setup():
+        asset = _assets()[0]
+        chart = Chart(
+            asset.price,
+            int(size[0] * 0.9),
+            int(size[1] * 0.5),
+            x_repr=lambda x: utils.to_time(x, zoom > 86400),
+            y_repr=lambda y: f"${y:.2f}",
+            data_many_lambda=asset.price_many,
+            envelope_lambda=asset.envelope_many,
+            candle_lambda=asset.candles_many,
+        )
+        chart.scale_x_min = START_TIME - zoom
+        chart.scale_x_max = START_TIME
+        chart.adjust_scale()
+
+        return getattr(chart, method)
+
+    return setup
+
+
+def _visualize_day() -> Callable[[], None]:
+    # One of `visualize.py`'s images, with a few trades on it
+    visualization._init_worker()
+    asset = _assets()[0]
+    x_min, x_max = visualization.day_range(asset, 1)
+    times = numpy.linspace(x_min, x_max, 20, endpoint=False).tolist()
+
+    job = (
+        asset.symbol,
+        1,
+        [
+            (
+                f"respondent{i % 4}",
+                {
+                    "time": t,
+                    "symbol": asset.symbol,
+                    "action": "buy" if i % 2 == 0 else "sell",
+                    "amount": i + 1,
+                    "balance": 0.0,
+                },
+            )
+            for i, t in enumerate(times)
+        ],
+    )
+    # Removed once the function's gone
+    out_dir = tempfile.TemporaryDirectory()
+
+    return lambda: visualization.render(job, Path(out_dir.name))
+
+
+def scenarios() -> Dict[str, Scenario]:
+    result = {
+        "load/npz": _load_npz,
+        "load/store": _load_store,
+        "asset/price": _price(False),
+        "asset/price_many": _price(True),
+    }
+    if hasattr(os, "posix_fadvise"):
+        result["load/npz/cold"] = _load_npz_cold
+
+    for width, height in WINDOW_SIZES:
+        for zoom in ZOOMS:
+            for method in ("adjust_scale", "line_chart", "draw_overlay"):
+                result[f"chart/{width}x{height}/{zoom}s/{method}"] = _chart(
+                    (width, height), zoom, method
+                )
+
+    result["visualize/day"] = _visualize_day
+    return result
+
+
+def measure(scenario: Scenario, repeat=5) -> dict:
+    # Seconds per call (the median and best of `repeat` timings), and the peak of
+    # what Python and NumPy allocated during one call. Memory SDL allocates for
+    # surfaces isn't seen by `tracemalloc`.
+    call = scenario()
+    call()
+
+    start = time.perf_counter()
+    call()
+    number = max(int(MIN_TIME / max(time.perf_counter() - start, 1e-9)), 1)
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        timings.append((time.perf_counter() - start) / number)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": statistics.median(timings),
+        "best": min(timings),
+        "peak_bytes": peak,
+    }
+
+
+def run(
+    chosen: Dict[str, Scenario],
+    repeat=5,
+    progress: Optional[Callable[[str, dict], None]] = None,
+) -> Dict[str, dict]:
+    # `progress(name, result)` is called after each scenario
+    results = {}
+    for name, scenario in chosen.items():
+        results[name] = measure(scenario, repeat)
+        if progress:
+            progress(name, results[name])
+
+    return results
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Optional[Dict[str, dict]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    return baseline["results"] if baseline.get("version") == VERSION else None
+
+
+def save_baseline(results: Dict[str, dict], path: Path = BASELINE_PATH):
+    # Kept next to the results, as they only compare on the same kind of machine
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": VERSION,
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+def regressions(
+    results: Dict[str, dict], baseline: Dict[str, dict], threshold=THRESHOLD
+) -> Dict[str, List[str]]:
+    # What got worse in every scenario that's in both, as readable lines
+    found = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        before = baseline[name]
+        problems = []
+
+        if result["seconds"] > before["seconds"] * (1 + threshold):
+            problems.append(
+                f"{before['seconds'] * 1000:.3f} ms -> {result['seconds'] * 1000:.3f} ms"
+            )
+        if (
+            result["peak_bytes"] > before["peak_bytes"] * (1 + threshold)
+            and result["peak_bytes"] - before["peak_bytes"] > MEMORY_SLACK
+        ):
+            problems.append(
+                f"{before['peak_bytes'] / 1024:.0f} KiB -> {result['peak_bytes'] / 1024:.0f} KiB"
+            )
+
+        if problems:
+            found[name] = problems
+
+    return found
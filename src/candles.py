@@ -0,0 +1,54 @@
+import math
+from typing import Tuple
+
+import numpy
+
+
+# Open, low, high and close of every `slots` consecutive slots of a price grid. The
+# candles are only worked out as far as they're asked for, and each call to
+# `extend()` resamples just the new part of the grid.
+class Candles:
+    def __init__(self, grid: numpy.ndarray, slots: int):
+        self.grid = grid
+        self.slots = slots
+
+        # opens, lows, highs, closes
+        self.data = numpy.full((4, math.ceil(len(grid) / slots)), math.nan)
+        self.count = 0
+
+    def extend(self, count: int):
+        count = min(count, self.data.shape[1])
+        if count <= self.count:
+            return
+
+        block = self.grid[self.count * self.slots : count * self.slots]
+        if len(block) % self.slots:
+            block = numpy.append(
+                block, numpy.full(self.slots - len(block) % self.slots, math.nan)
+            )
+        block = block.reshape(-1, self.slots)
+
+        valid = ~numpy.isnan(block)
+        found = valid.any(axis=1)
+        rows = numpy.arange(len(block))
+        first = numpy.argmax(valid, axis=1)
+        last = self.slots - 1 - numpy.argmax(valid[:, ::-1], axis=1)
+
+        data = self.data[:, self.count : count]
+        data[0] = numpy.where(found, block[rows, first], math.nan)
+        data[1] = numpy.fmin.reduce(block, axis=1)
+        data[2] = numpy.fmax.reduce(block, axis=1)
+        data[3] = numpy.where(found, block[rows, last], math.nan)
+
+        self.count = count
+
+    def query(
+        self, first: int, last: int
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        # Candles [first, last), clipped to the grid
+        first = max(first, 0)
+        last = max(min(last, self.data.shape[1]), first)
+        self.extend(last)
+
+        opens, lows, highs, closes = self.data[:, first:last]
+        return opens, lows, highs, closes
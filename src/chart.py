@@ -1,15 +1,23 @@
 import math
-from typing import Callable, Tuple
+from typing import Callable, List, Optional, Sequence, Tuple
 
+import numpy
 import pygame
 
 from . import utils
 
 
+def _runs(mask: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    # [start, end) of every run of consecutive `True`s
+    edges = numpy.diff(numpy.concatenate(([0], mask.astype(numpy.int8), [0])))
+    return numpy.flatnonzero(edges == 1), numpy.flatnonzero(edges == -1)
+
+
 class Chart:
-    FONT = utils.LARGE_FONT
+    FONT = None  # `utils.LARGE_FONT` unless set, which is loaded on first use
     X_PRECISION_BASE = 15
     Y_PRECISION_BASE = 10
+    MIN_CANDLE_WIDTH = 5
 
     def __init__(
         self,
@@ -29,9 +37,24 @@ class Chart:
         bg_color=(0, 0, 0, 0),
         nan_bg_color=(255, 0, 0, 128),
         gain_color=(0, 255, 0, 255),
-        loss_color=(255, 0, 0, 255)
+        loss_color=(255, 0, 0, 255),
+        envelope_color=(255, 255, 255, 64),
+        axes=True,
+        data_many_lambda: Optional[Callable[[numpy.ndarray], numpy.ndarray]] = None,
+        envelope_lambda: Optional[
+            Callable[[numpy.ndarray, numpy.ndarray], Tuple[numpy.ndarray, ...]]
+        ] = None,
+        candle_lambda: Optional[
+            Callable[[float, float, float], Tuple[numpy.ndarray, ...]]
+        ] = None,
+        series: Sequence[
+            Tuple[Callable[[numpy.ndarray], numpy.ndarray], Tuple[int, ...]]
+        ] = ()
     ):
         self.data_lambda = data_lambda
+        self.data_many_lambda = data_many_lambda
+        self.envelope_lambda = envelope_lambda
+        self.candle_lambda = candle_lambda
         self.width = width
         self.height = height
         self.x_margin = x_margin
@@ -47,9 +70,20 @@ class Chart:
         self.nan_bg_color = nan_bg_color
         self.gain_color = gain_color
         self.loss_color = loss_color
+        self.envelope_color = envelope_color
+        self.axes = axes  # Without them it's just the plot, e.g. for sparklines
+        # (data_many_lambda, color) of every extra line drawn over the plot, like
+        # indicators over the price
+        self.series = list(series)
+        # When set, the plot and the axes drawn over it get timed as separate stages
+        self.profiler = None
 
         self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
 
+        # What `scroll_chart()` last drew:
+        # (settings, scale_x_min, plot state, extra lines' states)
+        self._scroll = None
+
     def at(self, x: float) -> Tuple[float, float]:
         if self.y_margin <= x <= self.width:
             ax = utils.lerp(
@@ -61,24 +95,85 @@ class Chart:
         else:
             return math.nan, math.nan
 
-    def adjust_scale(self, margin_perc=0.125):
-        steps = [self.at(x)[1] for x in range(self.y_margin, self.width)]
-        steps = [y for y in steps if not math.isnan(y) and not math.isinf(y)]
+    def columns(
+        self, x_min: Optional[int] = None, x_max: Optional[int] = None
+    ) -> numpy.ndarray:
+        return numpy.arange(
+            self.y_margin if x_min is None else max(x_min, self.y_margin),
+            self.width if x_max is None else min(x_max, self.width),
+        )
+
+    def sample(
+        self, x_min: Optional[int] = None, x_max: Optional[int] = None
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        # Same as calling `at()` on every column in [x_min, x_max), but in one go
+        # when `data_many_lambda` is available.
+        xs = self.columns(x_min, x_max)
+        axs = utils.lerp(
+            xs, self.y_margin, self.width, self.scale_x_min, self.scale_x_max
+        )
+
+        if self.data_many_lambda is None:
+            ays = numpy.array([self.data_lambda(ax) for ax in axs], dtype=numpy.float64)
+        else:
+            ays = numpy.asarray(self.data_many_lambda(axs), dtype=numpy.float64)
+
+        return xs, axs, ays
+
+    def sample_envelope(
+        self, x_min: Optional[int] = None, x_max: Optional[int] = None
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        # Low, high and close of all the data each column covers, i.e. everything
+        # from its own X value up to the next column's
+        xs = self.columns(x_min, x_max)
+        _, lows, highs, closes = self.envelope_lambda(
+            utils.lerp(
+                xs, self.y_margin, self.width, self.scale_x_min, self.scale_x_max
+            ),
+            utils.lerp(
+                xs + 1, self.y_margin, self.width, self.scale_x_min, self.scale_x_max
+            ),
+        )
+
+        return xs, lows, highs, closes
+
+    def adjust_scale(self, margin_perc=0.125, envelope=False, sticky=False):
+        if envelope:
+            _, lows, highs, _ = self.sample_envelope()
+            steps = numpy.concatenate((lows, highs))
+        else:
+            steps = self.sample()[2]
+        steps = steps[numpy.isfinite(steps)]
 
         if len(steps) == 0:
             return
 
-        low = min(steps)
-        high = max(steps)
+        low = float(steps.min())
+        high = float(steps.max())
 
         scale_y_min = low - (high - low) * margin_perc
         scale_y_max = high + (high - low) * margin_perc
 
+        # Keep the current scale as long as everything still fits and it isn't
+        # overly loose, so `scroll_chart()` doesn't have to start over every frame
+        if (
+            sticky
+            and self.scale_y_min <= low
+            and high <= self.scale_y_max
+            and self.scale_y_max - self.scale_y_min <= (scale_y_max - scale_y_min) * 2
+        ):
+            return
+
         if scale_y_min != scale_y_max:
             self.scale_y_min = scale_y_min
             self.scale_y_max = scale_y_max
 
     def draw_overlay(self):
+        if self.profiler is not None:
+            self.profiler.lap("plot")
+        if not self.axes:
+            return
+
         x_precision = Chart.X_PRECISION_BASE ** math.floor(
             math.log(self.scale_x_max - self.scale_x_min, Chart.X_PRECISION_BASE)
         )
@@ -88,6 +183,7 @@ class Chart:
 
         ax = self.scale_x_min // x_precision * x_precision
         ay = self.scale_y_min // y_precision * y_precision
+        font = Chart.FONT or utils.LARGE_FONT
 
         pygame.draw.rect(
             self.surface,
@@ -107,13 +203,8 @@ class Chart:
                 ax, self.scale_x_min, self.scale_x_max, self.y_margin, self.width
             )
 
-            text = Chart.FONT.render(self.x_repr(ax), True, self.fg_color)
-            text = pygame.transform.scale(
-                text,
-                (
-                    int(text.get_width() * self.x_margin / text.get_height()),
-                    self.x_margin,
-                ),
+            text = utils.render(
+                font, self.x_repr(ax), self.fg_color, height=self.x_margin
             )
             self.surface.blit(
                 text,
@@ -141,73 +232,323 @@ class Chart:
                 ay, self.scale_y_min, self.scale_y_max, self.height - self.x_margin, 0
             )
 
-            text = Chart.FONT.render(self.y_repr(ay), True, self.fg_color)
-            text = pygame.transform.scale(
-                text,
-                (
-                    self.y_margin,
-                    int(text.get_height() * self.y_margin / text.get_width()),
-                ),
+            text = utils.render(
+                font, self.y_repr(ay), self.fg_color, width=self.y_margin
             )
             self.surface.blit(text, (0, y - text.get_height() / 2))
 
             ay += y_precision
 
+        if self.profiler is not None:
+            self.profiler.lap("draw_overlay")
+
+    def plot_columns(
+        self, x_min: int, x_max: int, prev_y=math.nan, prev_stat=0
+    ) -> Tuple[float, int]:
+        # Draws the line for columns [x_min, x_max), continuing from the previous
+        # column's `prev_y` and `prev_stat` (1: gain; -1: loss). Returns the state
+        # to continue from afterwards.
+        xs, _, ays = self.sample(x_min, x_max)
+        return self.plot(xs, ays, prev_y, prev_stat)
+
+    def plot(
+        self, xs: numpy.ndarray, ays: numpy.ndarray, prev_y=math.nan, prev_stat=0
+    ) -> Tuple[float, int]:
+        if len(xs) == 0:
+            return prev_y, prev_stat
+
+        ys = utils.lerp(
+            ays, self.scale_y_min, self.scale_y_max, self.height - self.x_margin, 0
+        )
+
+        for start, end in zip(*_runs(numpy.isnan(ys))):
+            pygame.draw.rect(
+                self.surface,
+                self.nan_bg_color,
+                (
+                    (xs[start], 0),
+                    (end - start, self.height - self.x_margin + 1),
+                ),
+            )
+
+        # Segment `i` goes from point `i` to point `i + 1`
+        px = numpy.concatenate(([xs[0] - 1], xs))
+        py = numpy.concatenate(([prev_y], ys))
+        valid = ~numpy.isnan(py[:-1]) & ~numpy.isnan(py[1:])
+
+        # Remember that the Y axis is flipped. Flat segments keep the color of the
+        # last rising or falling one.
+        dy = py[1:] - py[:-1]
+        stat = numpy.concatenate(
+            ([prev_stat], numpy.where(dy < 0, 1, numpy.where(dy > 0, -1, 0)))
+        )
+        last = numpy.where(stat != 0, numpy.arange(len(stat)), 0)
+        numpy.maximum.accumulate(last, out=last)
+        stat = stat[last]
+
+        # Then every run of same-colored segments is one polyline
+        codes = numpy.where(valid, stat[1:], 2)
+        bounds = numpy.flatnonzero(codes[1:] != codes[:-1]) + 1
+        points = numpy.column_stack((px, py)).tolist()
+        colors = {1: self.gain_color, -1: self.loss_color, 0: self.fg_color}
+
+        for start, end in zip(
+            numpy.concatenate(([0], bounds)), numpy.concatenate((bounds, [len(codes)]))
+        ):
+            if codes[start] != 2:
+                pygame.draw.lines(
+                    self.surface,
+                    colors[int(codes[start])],
+                    False,
+                    points[start : end + 1],
+                )
+
+        return py[-1], int(stat[-1])
+
+    def plot_series(
+        self, x_min: int, x_max: int, prev_ys: Optional[List[float]] = None
+    ) -> List[float]:
+        # Draws every line of `series` for columns [x_min, x_max), continuing from
+        # the previous column's `prev_ys`. Returns where each line ended up.
+        if prev_ys is None:
+            prev_ys = [math.nan] * len(self.series)
+
+        xs = self.columns(x_min, x_max)
+        if len(xs) == 0 or not self.series:
+            return prev_ys
+
+        axs = utils.lerp(
+            xs, self.y_margin, self.width, self.scale_x_min, self.scale_x_max
+        )
+        px = numpy.concatenate(([xs[0] - 1], xs))
+        last_ys = []
+
+        for (many_lambda, color), prev_y in zip(self.series, prev_ys):
+            ys = utils.lerp(
+                numpy.asarray(many_lambda(axs), dtype=numpy.float64),
+                self.scale_y_min,
+                self.scale_y_max,
+                self.height - self.x_margin,
+                0,
+            )
+            py = numpy.concatenate(([prev_y], ys))
+
+            for start, end in zip(*_runs(~numpy.isnan(py))):
+                if end - start > 1:
+                    pygame.draw.lines(
+                        self.surface,
+                        color,
+                        False,
+                        numpy.column_stack((px[start:end], py[start:end])).tolist(),
+                    )
+
+            last_ys.append(py[-1])
+
+        return last_ys
+
     def line_chart(self):
         if self.surface.get_size() != (self.width, self.height):
             self.surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
 
         self.surface.fill(self.bg_color)
+        self.plot_columns(self.y_margin, self.width)
+        self.plot_series(self.y_margin, self.width)
+        self.draw_overlay()
+
+        self._scroll = None
+
+    def plot_envelope_columns(
+        self, x_min: int, x_max: int, prev_y=math.nan, prev_stat=0
+    ) -> Tuple[float, int]:
+        # The full low-high range of every column as a band, with the line going
+        # through each column's close. The band starts from the column before, so it
+        # connects to whatever's already drawn there, but is clipped to leave that
+        # column alone.
+        xs, lows, highs, closes = self.sample_envelope(
+            max(x_min - 1, self.y_margin), x_max
+        )
+        if len(xs) == 0:
+            return prev_y, prev_stat
+
+        low_ys = utils.lerp(
+            lows, self.scale_y_min, self.scale_y_max, self.height - self.x_margin, 0
+        )
+        high_ys = utils.lerp(
+            highs, self.scale_y_min, self.scale_y_max, self.height - self.x_margin, 0
+        )
 
-        prev_y = math.nan
-        prev_stat = 0  # 1: gain; -1: loss
-        for x in range(self.y_margin, self.width):
-            ax, ay = self.at(x)
+        clip = self.surface.get_clip()
+        self.surface.set_clip(((x_min, 0), (x_max - x_min, self.height)))
 
-            if math.isnan(ay):
-                prev_y = math.nan
+        for start, end in zip(*_runs(~numpy.isnan(lows))):
+            if end - start == 1:
                 pygame.draw.line(
                     self.surface,
-                    self.nan_bg_color,
-                    (x, 0),
-                    (x, self.height - self.x_margin),
+                    self.envelope_color,
+                    (xs[start], high_ys[start]),
+                    (xs[start], low_ys[start]),
+                )
+            else:
+                top = numpy.column_stack((xs[start:end], high_ys[start:end]))
+                bottom = numpy.column_stack((xs[start:end], low_ys[start:end]))
+                pygame.draw.polygon(
+                    self.surface,
+                    self.envelope_color,
+                    top.tolist() + bottom[::-1].tolist(),
                 )
-                continue
 
-            y = utils.lerp(
-                ay, self.scale_y_min, self.scale_y_max, self.height - self.x_margin, 0
+        self.surface.set_clip(clip)
+
+        skip = 1 if xs[0] < x_min else 0
+        return self.plot(xs[skip:], closes[skip:], prev_y, prev_stat)
+
+    def envelope_chart(self):
+        if self.surface.get_size() != (self.width, self.height):
+            self.surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+
+        self.surface.fill(self.bg_color)
+        self.plot_envelope_columns(self.y_margin, self.width)
+        self.plot_series(self.y_margin, self.width)
+        self.draw_overlay()
+
+        self._scroll = None
+
+    def invalidate(self):
+        # Makes the next `scroll_chart()` redraw everything, for when the data
+        # behind the lambdas changed
+        self._scroll = None
+
+    def scroll_chart(self, envelope=False):
+        # Same picture as `line_chart()` (or `envelope_chart()`), but when the X
+        # range only moved forward since the last call, the previous plot is shifted
+        # left by the whole columns it moved and just the new columns are drawn.
+        # `scale_x_min` and `scale_x_max` are snapped to what's actually shown.
+        span = self.scale_x_max - self.scale_x_min
+        column = span / (self.width - self.y_margin)
+        settings = (
+            self.width,
+            self.height,
+            self.x_margin,
+            self.y_margin,
+            span,
+            self.scale_y_min,
+            self.scale_y_max,
+            envelope,
+            len(self.series),
+        )
+        plot_columns = self.plot_envelope_columns if envelope else self.plot_columns
+
+        shift = -1
+        if self._scroll is not None and self._scroll[0] == settings:
+            shift = math.floor((self.scale_x_min - self._scroll[1]) / column)
+
+        if 0 <= shift < self.width - self.y_margin:
+            self.scale_x_min = self._scroll[1] + shift * column
+            self.scale_x_max = self.scale_x_min + span
+
+            # Nothing new to show, and the overlay would come out the same too
+            if shift == 0:
+                return
+
+            # The overlay only draws over the plot where it'll draw over it again
+            # anyway, so it can just be scrolled along
+            self.surface.scroll(-shift, 0)
+            self.surface.fill(
+                self.bg_color, ((self.width - shift, 0), (shift, self.height))
+            )
+            state = plot_columns(self.width - shift, self.width, *self._scroll[2])
+            series_state = self.plot_series(
+                self.width - shift, self.width, self._scroll[3]
             )
+        else:
+            if self.surface.get_size() != (self.width, self.height):
+                self.surface = pygame.Surface(
+                    (self.width, self.height), pygame.SRCALPHA
+                )
+
+            self.surface.fill(self.bg_color)
+            state = plot_columns(self.y_margin, self.width)
+            series_state = self.plot_series(self.y_margin, self.width)
 
-            if math.isnan(prev_y):
-                prev_y = y
-                continue
+        self._scroll = (settings, self.scale_x_min, state, series_state)
+        self.draw_overlay()
 
+    def candle_chart(self, candle_period=60):
+        if self.surface.get_size() != (self.width, self.height):
+            self.surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+
+        self.surface.fill(self.bg_color)
+
+        # Candles are made longer when they'd get too thin to make out
+        column = (self.scale_x_max - self.scale_x_min) / (self.width - self.y_margin)
+        while candle_period < column * Chart.MIN_CANDLE_WIDTH:
+            candle_period *= 2
+
+        times, opens, lows, highs, closes = self.candle_lambda(
+            candle_period, self.scale_x_min, self.scale_x_max
+        )
+        x0s = utils.lerp(
+            times, self.scale_x_min, self.scale_x_max, self.y_margin, self.width
+        )
+        x1s = utils.lerp(
+            times + candle_period,
+            self.scale_x_min,
+            self.scale_x_max,
+            self.y_margin,
+            self.width,
+        )
+        open_ys, low_ys, high_ys, close_ys = (
+            utils.lerp(
+                a, self.scale_y_min, self.scale_y_max, self.height - self.x_margin, 0
+            )
+            for a in (opens, lows, highs, closes)
+        )
+
+        clip = self.surface.get_clip()
+        self.surface.set_clip(
+            (
+                (self.y_margin, 0),
+                (self.width - self.y_margin, self.height - self.x_margin),
+            )
+        )
+
+        for start, end in zip(*_runs(numpy.isnan(opens))):
+            pygame.draw.rect(
+                self.surface,
+                self.nan_bg_color,
+                (
+                    (x0s[start], 0),
+                    (x1s[end - 1] - x0s[start], self.height - self.x_margin + 1),
+                ),
+            )
+
+        for i in numpy.flatnonzero(~numpy.isnan(opens)):
             # Remember that the Y axis is flipped
-            if y < prev_y:
-                pygame.draw.line(self.surface, self.gain_color, (x - 1, prev_y), (x, y))
-                prev_stat = 1
-            elif y > prev_y:
-                pygame.draw.line(self.surface, self.loss_color, (x - 1, prev_y), (x, y))
-                prev_stat = -1
-            # These two can't be OR'd together above.
-            elif prev_stat == 1:
-                pygame.draw.line(self.surface, self.gain_color, (x - 1, prev_y), (x, y))
-            elif prev_stat == -1:
-                pygame.draw.line(self.surface, self.loss_color, (x - 1, prev_y), (x, y))
+            if close_ys[i] < open_ys[i]:
+                color = self.gain_color
+            elif close_ys[i] > open_ys[i]:
+                color = self.loss_color
             else:
-                pygame.draw.line(self.surface, self.fg_color, (x - 1, prev_y), (x, y))
+                color = self.fg_color
 
-            prev_y = y
+            middle = (x0s[i] + x1s[i]) / 2
+            pygame.draw.line(
+                self.surface, color, (middle, high_ys[i]), (middle, low_ys[i])
+            )
+            pygame.draw.rect(
+                self.surface,
+                color,
+                (
+                    (x0s[i] + 1, min(open_ys[i], close_ys[i])),
+                    (
+                        max(x1s[i] - x0s[i] - 2, 1),
+                        max(abs(open_ys[i] - close_ys[i]), 1),
+                    ),
+                ),
+            )
 
+        self.surface.set_clip(clip)
+        self.plot_series(self.y_margin, self.width)
         self.draw_overlay()
 
-    # def candle_chart(self, candle_period=60):
-    #     if self.surface.get_size() != (self.width, self.height):
-    #         self.surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
-    #
-    #     self.surface.fill(self.bg_color)
-    #
-    #     for x in range(self.y_margin, self.width):
-    #         ax, ay = self.at(x)
-    #
-    #     self.draw_overlay()
+        self._scroll = None
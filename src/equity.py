@@ -0,0 +1,84 @@
+from typing import List
+
+import numpy
+
+from .asset import Asset
+from .portfolio import Ledger
+
+
+# What a portfolio was worth over time: its cash plus every holding at the last known
+# price. Starting from `balance` and `positions` (amount owned of every asset), the
+# cash and positions after every trade of `ledger` are running sums kept as arrays,
+# extended whenever the ledger has grown. Any number of timestamps are then valued at
+# once, by finding the last trade before each and pricing the positions after it.
+# The starting state counts for all time before the first trade.
+class EquityCurve:
+    def __init__(
+        self,
+        assets: List[Asset],
+        ledger: Ledger,
+        balance: float,
+        positions: numpy.ndarray,
+    ):
+        self.assets = assets
+        self.ledger = ledger
+
+        self._count = 0  # Trades of the ledger summed up so far
+        self._times = numpy.zeros(0)
+        # Row `k` is the state after the first `k` trades
+        self._cash = numpy.array([float(balance)])
+        self._positions = numpy.array([positions], dtype=numpy.float64)
+
+    @classmethod
+    def ending_at(
+        cls,
+        assets: List[Asset],
+        ledger: Ledger,
+        balance: float,
+        positions: numpy.ndarray,
+    ) -> "EquityCurve":
+        # The curve that ends up at `balance` and `positions` after all of the
+        # ledger's trades so far, e.g. a loaded session with its past trades. What
+        # the trades don't account for counts as held from the start.
+        return cls(
+            assets,
+            ledger,
+            balance - sum(ledger.money),
+            numpy.asarray(positions, dtype=numpy.float64)
+            - numpy.bincount(ledger.asset_ids, ledger.amounts, len(assets)),
+        )
+
+    def _sync(self):
+        count = len(self.ledger)
+        if count == self._count:
+            return
+
+        new = slice(self._count, count)
+        rows = numpy.arange(count - self._count)
+        changes = numpy.zeros((len(rows), len(self.assets)))
+        changes[rows, self.ledger.asset_ids[new]] = self.ledger.amounts[new]
+
+        self._times = numpy.concatenate((self._times, self.ledger.times[new]))
+        self._cash = numpy.concatenate(
+            (self._cash, self._cash[-1] + numpy.cumsum(self.ledger.money[new]))
+        )
+        self._positions = numpy.concatenate(
+            (self._positions, self._positions[-1] + numpy.cumsum(changes, axis=0))
+        )
+        self._count = count
+
+    def value_many(self, ts: numpy.ndarray) -> numpy.ndarray:
+        # Worth of the portfolio at every timestamp of `ts`, NaN where something
+        # held has no price yet
+        self._sync()
+        ts = numpy.asarray(ts, dtype=numpy.float64)
+
+        trades = numpy.searchsorted(self._times, ts, side="right")
+        positions = self._positions[trades]
+        prices = numpy.stack([asset.last_price_many(ts) for asset in self.assets], 1)
+        worth = numpy.where(positions != 0, positions * prices, 0.0)
+
+        return self._cash[trades] + worth.sum(axis=1)
+
+    def value(self, t: float) -> float:
+        return float(self.value_many([t])[0])
@@ -0,0 +1,130 @@
+import math
+from typing import Dict, Tuple
+
+import numpy
+
+
+# Technical indicators over an asset's prices, one value per sample. Everything is
+# worked out a whole day at a time, only as far as `extend()` has been asked to,
+# and picked up from there on the next call:
+#
+#   ("sma", window)                  Average of the last `window` samples
+#   ("ema", span)                    Exponential average, weighing in 2 / (span + 1)
+#   ("bollinger_lower", window, k)   SMA minus/plus `k` standard deviations over
+#   ("bollinger_upper", window, k)   the same window
+#   ("session_average",)             Average since the day's first sample. A VWAP
+#                                    without the volume, as there isn't any.
+#
+# Windows are counted in samples and skip missing prices. The averages over windows
+# come from prefix sums, and the EMA from its recursion solved in closed form over
+# blocks of samples, so none of them loop per sample.
+class Indicators:
+    def __init__(self, prices: numpy.ndarray, day_offsets: numpy.ndarray):
+        self.prices = prices
+        self.day_offsets = day_offsets
+        self.count = 0  # Samples worked out so far
+
+        # Of the prices that aren't NaN, up to each sample
+        self._sums = numpy.zeros(len(prices) + 1)
+        self._squares = numpy.zeros(len(prices) + 1)
+        self._counts = numpy.zeros(len(prices) + 1, dtype=numpy.int64)
+
+        self._series: Dict[Tuple, numpy.ndarray] = {}
+
+    def series(self, *key) -> numpy.ndarray:
+        # The indicator's values for every sample, NaN past `count`
+        if key not in self._series:
+            self._series[key] = numpy.full(len(self.prices), math.nan)
+            self._compute(key, 0, self.count)
+
+        return self._series[key]
+
+    def extend(self, index: int):
+        # Works everything out through the end of the day sample `index` is in
+        day = numpy.searchsorted(self.day_offsets, index, side="right") - 1
+        count = int(self.day_offsets[min(day + 1, len(self.day_offsets) - 1)])
+        if count <= self.count:
+            return
+
+        lo, hi = self.count, count
+        block = self.prices[lo:hi]
+        valid = ~numpy.isnan(block)
+        block = numpy.where(valid, block, 0.0)
+
+        self._sums[lo + 1 : hi + 1] = self._sums[lo] + numpy.cumsum(block)
+        self._squares[lo + 1 : hi + 1] = self._squares[lo] + numpy.cumsum(block**2)
+        self._counts[lo + 1 : hi + 1] = self._counts[lo] + numpy.cumsum(valid)
+        self.count = hi
+
+        for key in self._series:
+            self._compute(key, lo, hi)
+
+    def _window(self, starts: numpy.ndarray, lo: int, hi: int):
+        # Mean and variance of the prices from `starts` up to each of [lo, hi)
+        ends = numpy.arange(lo + 1, hi + 1)
+        counts = self._counts[ends] - self._counts[starts]
+
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            mean = (self._sums[ends] - self._sums[starts]) / counts
+            variance = (self._squares[ends] - self._squares[starts]) / counts - mean**2
+
+        return mean, numpy.maximum(variance, 0.0)
+
+    def _compute(self, key: Tuple, lo: int, hi: int):
+        out = self._series[key]
+        kind = key[0]
+
+        if kind == "ema":
+            self._ema(out, key[1], lo, hi)
+        elif kind == "session_average":
+            days = numpy.searchsorted(
+                self.day_offsets, numpy.arange(lo, hi), side="right"
+            )
+            out[lo:hi] = self._window(self.day_offsets[days - 1], lo, hi)[0]
+        else:
+            window = key[1]
+            starts = numpy.maximum(numpy.arange(lo + 1, hi + 1) - window, 0)
+            mean, variance = self._window(starts, lo, hi)
+
+            if kind == "sma":
+                out[lo:hi] = mean
+            elif kind == "bollinger_lower":
+                out[lo:hi] = mean - key[2] * numpy.sqrt(variance)
+            elif kind == "bollinger_upper":
+                out[lo:hi] = mean + key[2] * numpy.sqrt(variance)
+            else:
+                raise ValueError(f"Unknown indicator {key}")
+
+    def _ema(self, out: numpy.ndarray, span: int, lo: int, hi: int):
+        # ema[t] = a * price[t] + (1 - a) * ema[t - 1], or ema[t - 1] where there's no
+        # price. With P[t] the product of the (1 - a)s so far, that's
+        # ema[t] = P[t] * (ema[lo - 1] + sum of a * price[j] / P[j] up to t), which
+        # is done in blocks short enough for 1 / P not to overflow.
+        alpha = 2 / (span + 1)
+        decay = math.log1p(-alpha)
+        step = max(int(600 / -decay), 1)
+        prev = out[lo - 1] if lo > 0 else math.nan
+
+        start = lo
+        while start < hi:
+            end = min(start + step, hi)
+            block = self.prices[start:end]
+            valid = ~numpy.isnan(block)
+
+            # Starts off at the first price
+            if math.isnan(prev):
+                if not valid.any():
+                    start = end
+                    continue
+
+                first = int(numpy.argmax(valid))
+                prev = block[first]
+                start += first
+                continue
+
+            logs = numpy.cumsum(numpy.where(valid, decay, 0.0))
+            terms = numpy.where(valid, alpha * block, 0.0) * numpy.exp(-logs)
+            out[start:end] = numpy.exp(logs) * (prev + numpy.cumsum(terms))
+
+            prev = out[end - 1]
+            start = end
@@ -0,0 +1,175 @@
+import enum
+from typing import List
+
+import numpy
+
+from .portfolio import Portfolio
+
+
+class OrderType(enum.Enum):
+    LIMIT = enum.auto()
+    STOP = enum.auto()
+
+
+class Order:
+    def __init__(
+        self, asset: int, side: str, order_type: OrderType, amount: float, price: float
+    ):
+        self.asset = asset  # Index into the portfolio's assets
+        self.side = side  # "buy" or "sell"
+        self.order_type = order_type
+        self.amount = amount
+        self.price = price
+
+    def to_dict(self) -> dict:
+        return {
+            "asset": self.asset,
+            "side": self.side,
+            "type": self.order_type.name,
+            "amount": self.amount,
+            "price": self.price,
+        }
+
+    @classmethod
+    def from_dict(cls, di: dict) -> "Order":
+        return cls(
+            di["asset"], di["side"], OrderType[di["type"]], di["amount"], di["price"]
+        )
+
+
+# Resting limit and stop orders, filled against a portfolio as the simulation moves
+# along. The book keeps one array per field, like `Portfolio`. Rather than checking
+# every order on every tick, `update()` takes the running low and high of each
+# asset's prices over the time that passed, which only ever go down and up
+# respectively, and binary searches them for the first tick that crosses each
+# order's price, so only the orders that actually go off are touched one by one.
+class OrderBook:
+    def __init__(self, portfolio: Portfolio):
+        self.portfolio = portfolio
+
+        self.assets = numpy.zeros(0, dtype=numpy.int64)
+        self.buys = numpy.zeros(0, dtype=bool)
+        self.stops = numpy.zeros(0, dtype=bool)
+        self.amounts = numpy.zeros(0)
+        self.prices = numpy.zeros(0)
+
+        self.journal = None  # Told about every change, see `persistence.Journal`
+
+    def __len__(self) -> int:
+        return len(self.assets)
+
+    def order(self, j: int) -> Order:
+        return Order(
+            int(self.assets[j]),
+            "buy" if self.buys[j] else "sell",
+            OrderType.STOP if self.stops[j] else OrderType.LIMIT,
+            float(self.amounts[j]),
+            float(self.prices[j]),
+        )
+
+    def place(self, order: Order):
+        if self.journal is not None:
+            self.journal.order("place", order)
+
+        self.assets = numpy.append(self.assets, order.asset)
+        self.buys = numpy.append(self.buys, order.side == "buy")
+        self.stops = numpy.append(self.stops, order.order_type == OrderType.STOP)
+        self.amounts = numpy.append(self.amounts, order.amount)
+        self.prices = numpy.append(self.prices, order.price)
+
+    def _keep(self, mask: numpy.ndarray):
+        self.assets = self.assets[mask]
+        self.buys = self.buys[mask]
+        self.stops = self.stops[mask]
+        self.amounts = self.amounts[mask]
+        self.prices = self.prices[mask]
+
+    def _drop(self, mask: numpy.ndarray) -> List[Order]:
+        # Takes the orders under `mask` off the book and gives them
+        dropped = [self.order(j) for j in numpy.flatnonzero(mask)]
+        if self.journal is not None:
+            for order in dropped:
+                self.journal.order("remove", order)
+
+        self._keep(~mask)
+        return dropped
+
+    def remove(self, order: Order):
+        # The first order on the book that's the same as `order`
+        mask = (
+            (self.assets == order.asset)
+            & (self.buys == (order.side == "buy"))
+            & (self.stops == (order.order_type == OrderType.STOP))
+            & (self.amounts == order.amount)
+            & (self.prices == order.price)
+        )
+        mask[numpy.flatnonzero(mask)[1:]] = False
+        self._drop(mask)
+
+    def cancel(self, asset: int):
+        self._drop(self.assets == asset)
+
+    def open_orders(self, asset: int) -> List[Order]:
+        return [self.order(j) for j in numpy.flatnonzero(self.assets == asset)]
+
+    def update(self, t0: float, t1: float) -> List[Order]:
+        # Goes through the ticks in (t0, t1], filling every order at the first tick
+        # whose price crosses its own. Orders are taken off the book once triggered,
+        # even if the portfolio couldn't afford them by then. Returns the filled ones.
+        if not len(self) or t1 <= t0:
+            return []
+
+        fill_times = numpy.full(len(self), numpy.inf)
+
+        for i in numpy.unique(self.assets):
+            asset = self.portfolio.assets[i]
+            lo, hi = asset.last_indices([t0, t1]) + 1
+            if lo >= hi:
+                continue
+
+            window = asset.prices[lo:hi]
+            lows = numpy.minimum.accumulate(
+                numpy.where(numpy.isnan(window), numpy.inf, window)
+            )
+            highs = numpy.maximum.accumulate(
+                numpy.where(numpy.isnan(window), -numpy.inf, window)
+            )
+
+            # Buy limits and sell stops go off once the price drops to theirs, the
+            # other two once it rises to it
+            mask = self.assets == i
+            ticks = numpy.where(
+                self.buys[mask] != self.stops[mask],
+                numpy.searchsorted(-lows, -self.prices[mask], side="left"),
+                numpy.searchsorted(highs, self.prices[mask], side="left"),
+            )
+
+            hit = ticks < len(window)
+            times = numpy.full(len(ticks), numpy.inf)
+            times[hit] = asset.times(lo + ticks[hit])
+            fill_times[mask] = times
+
+        triggered = numpy.isfinite(fill_times)
+        if not triggered.any():
+            return []
+
+        # Filled in the order they went off, so earlier fills free up balance first
+        times = fill_times[triggered]
+        orders = self._drop(triggered)
+
+        filled = []
+        for j in numpy.argsort(times, kind="stable"):
+            order = orders[j]
+            fill = self.portfolio.buy if order.side == "buy" else self.portfolio.sell
+            if fill(order.asset, order.amount, float(times[j])):
+                filled.append(order)
+
+        return filled
+
+    def to_list(self) -> list:
+        return [self.order(j).to_dict() for j in range(len(self))]
+
+    def load_list(self, orders: list):
+        self._keep(numpy.zeros(len(self), dtype=bool))
+        for order in orders:
+            self.place(Order.from_dict(order))
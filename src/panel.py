@@ -0,0 +1,108 @@
+from typing import Callable, Hashable, List, Optional, Tuple
+
+import pygame
+
+
+# A part of the window with its own surface, which is only rendered again when the
+# key it was last rendered for changes
+class Panel:
+    def __init__(self):
+        self.surface: Optional[pygame.Surface] = None
+        self.pos = (0, 0)
+        self.changed = True
+
+        self._key = object()
+        self._shown: Optional[pygame.Rect] = None  # Where it was last put on screen
+
+    @property
+    def rect(self) -> Optional[pygame.Rect]:
+        if self.surface is None:
+            return None
+
+        return pygame.Rect(self.pos, self.surface.get_size())
+
+    def update(self, key: Hashable, render: Callable[[], Optional[pygame.Surface]]):
+        # `render` gives the panel's new surface, or None to hide it
+        if key != self._key:
+            self._key = key
+            self.surface = render()
+            self.changed = True
+
+    def invalidate(self):
+        # Rendered again at the next update, whatever the key
+        self._key = object()
+
+    def move(self, pos: Tuple[float, float]):
+        pos = (int(pos[0]), int(pos[1]))
+        if pos != self.pos:
+            self.pos = pos
+            self.changed = True
+
+
+# Puts panels on the window in the order they were added, only pushing the parts
+# of the screen that changed since the last frame to the display
+class Compositor:
+    def __init__(self, background: Tuple[int, int, int]):
+        self.background = background
+        self.panels: List[Panel] = []
+
+        self._size = None
+
+    def add(self) -> Panel:
+        self.panels.append(panel := Panel())
+        return panel
+
+    def invalidate(self):
+        # Everything gets redrawn next time, e.g. when the window was hidden
+        self._size = None
+
+    def present(self, window: pygame.Surface):
+        if window.get_size() != self._size:
+            self._size = window.get_size()
+
+            window.fill(self.background)
+            for panel in self.panels:
+                if panel.surface is not None:
+                    window.blit(panel.surface, panel.pos)
+                panel._shown = panel.rect
+                panel.changed = False
+
+            pygame.display.flip()
+            return
+
+        # Both where changed panels were and where they are now need redrawing,
+        # along with whatever else overlaps those spots
+        rects = []
+        for panel in self.panels:
+            if panel.changed:
+                rects += [rect for rect in (panel._shown, panel.rect) if rect]
+                panel._shown = panel.rect
+                panel.changed = False
+
+        if not rects:
+            return
+
+        for rect in rects:
+            window.set_clip(rect)
+            window.fill(self.background)
+
+            for panel in self.panels:
+                if panel.surface is not None and panel.rect.colliderect(rect):
+                    window.blit(panel.surface, panel.pos)
+
+        window.set_clip(None)
+        pygame.display.update(rects)
+
+
+def stack(surfaces: List[pygame.Surface], right=False) -> pygame.Surface:
+    # One surface with `surfaces` on top of each other, aligned to the left/right
+    width = max((surface.get_width() for surface in surfaces), default=0)
+    height = sum(surface.get_height() for surface in surfaces)
+    stacked = pygame.Surface((width, height), pygame.SRCALPHA)
+
+    y = 0
+    for surface in surfaces:
+        stacked.blit(surface, (width - surface.get_width() if right else 0, y))
+        y += surface.get_height()
+
+    return stacked
@@ -0,0 +1,267 @@
+import json
+import os
+import struct
+import time
+import warnings
+from pathlib import Path
+from typing import Optional
+
+import numpy
+
+from .orders import Order, OrderBook, OrderType
+from .portfolio import Portfolio
+
+
+# A session is saved as a binary snapshot of the whole state, plus a journal of
+# everything that happened since. Every trade, order change and (once in a while)
+# the clock is appended to the journal as it happens, which is one small write.
+# Once the journal grows long, or when quitting, it's compacted: a new snapshot is
+# written next to the old one and swapped in with `os.replace`, and the journal is
+# emptied. Loading takes the snapshot and replays the journal on top of it.
+#
+# Records carry increasing sequence numbers, and the snapshot the last one it
+# includes, so records left over from a crash mid-compaction aren't replayed twice.
+# A record cut short at the end of the journal is ignored.
+#
+# Snapshot layout:
+#
+#   MAGIC | version (u32) | sequence (u64) | time (f64) | balance (f64)
+#   | asset count (u32) | invested money, invested amount, returned money and
+#   returned amount of every asset (f64 arrays) | order count (u32) | ORDER * count
+SNAPSHOT_MAGIC = b"TSSAVE\0\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEAD = struct.Struct("<8sIQddI")
+ORDER = struct.Struct("<HBBdd")  # asset, buy, stop, amount, price
+
+# sequence, kind, flags (BUY | STOP), asset, time, amount, price
+RECORD = struct.Struct("<QBBHddd")
+CLOCK, TRADE, PLACE, REMOVE = range(4)
+BUY, STOP = 1, 2
+
+CHECKPOINT_INTERVAL = 1.0  # Seconds of real time between clock records
+COMPACT_RECORDS = 4096
+
+SAVE_PATH = Path("save")
+LEGACY_PATH = Path("save.json")
+
+
+class Journal:
+    def __init__(
+        self, portfolio: Portfolio, order_book: OrderBook, path: Path = SAVE_PATH
+    ):
+        self.portfolio = portfolio
+        self.order_book = order_book
+
+        self.snapshot_path = Path(path).with_suffix(".bin")
+        self.journal_path = Path(path).with_suffix(".journal")
+
+        self.sequence = 0
+        self.time = 0.0  # Latest sim time seen
+        self.records = 0  # Since the last compaction
+
+        self._file = None
+        self._last_checkpoint = -CHECKPOINT_INTERVAL
+
+    def load(self) -> Optional[float]:
+        # Restores the saved session, if there's any, and starts journaling the
+        # portfolio and order book. Gives the sim time it was at, or None when
+        # there was nothing to restore. A snapshot that can't be read is left out,
+        # along with the journal on top of it, with a warning.
+        loaded = False
+        readable = True
+
+        if self.snapshot_path.is_file():
+            try:
+                self._read_snapshot()
+                loaded = True
+            except (OSError, ValueError, struct.error) as e:
+                warnings.warn(f"Couldn't load {self.snapshot_path}, starting over: {e}")
+                readable = False
+
+        if not loaded and LEGACY_PATH.is_file():
+            with open(LEGACY_PATH, "r") as f:
+                di = json.load(f)
+
+            self.time = di["time"]
+            self.portfolio.load_dict(di)
+            self.order_book.load_list(di.get("orders", []))
+            loaded = True
+
+        if readable and self.journal_path.is_file():
+            loaded |= self._replay()
+
+        self.portfolio.journal = self
+        self.order_book.journal = self
+
+        # Nothing gets saved until there's a sim time to save it at, so a crash
+        # before then starts over from the beginning again
+        if loaded:
+            self.compact()
+        else:
+            self._file = open(self.journal_path, "wb", buffering=0)
+
+        return self.time if loaded else None
+
+    def _read_snapshot(self):
+        with open(self.snapshot_path, "rb") as f:
+            data = f.read()
+
+        magic, version, sequence, t, balance, count = SNAPSHOT_HEAD.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{self.snapshot_path} isn't a save of this version")
+        if count != len(self.portfolio.assets):
+            raise ValueError(f"{self.snapshot_path} has {count} assets")
+
+        offset = SNAPSHOT_HEAD.size
+        fields = numpy.frombuffer(data, "<f8", 4 * count, offset).reshape(4, count)
+        offset += fields.nbytes
+
+        (count,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        if len(data) != offset + count * ORDER.size:
+            raise ValueError(f"{self.snapshot_path} is cut short")
+
+        # Only applied once all of it was read
+        self.sequence = sequence
+        self.time = t
+        self.portfolio.balance = balance
+        (
+            self.portfolio.invested_money[:],
+            self.portfolio.invested_amount[:],
+            self.portfolio.returned_money[:],
+            self.portfolio.returned_amount[:],
+        ) = fields
+
+        self.order_book.load_list([])
+        for asset, buy, stop, amount, price in ORDER.iter_unpack(data[offset:]):
+            self.order_book.place(
+                Order(
+                    asset,
+                    "buy" if buy else "sell",
+                    OrderType.STOP if stop else OrderType.LIMIT,
+                    amount,
+                    price,
+                )
+            )
+
+    def _replay(self) -> bool:
+        # Whether anything was replayed
+        with open(self.journal_path, "rb") as f:
+            data = f.read()
+
+        replayed = False
+        usable = len(data) - len(data) % RECORD.size
+        for sequence, kind, flags, asset, t, amount, price in RECORD.iter_unpack(
+            data[:usable]
+        ):
+            if sequence <= self.sequence:
+                continue
+
+            if kind == TRADE:
+                side = "buy" if flags & BUY else "sell"
+                self.portfolio.apply(asset, side, amount, price)
+            elif kind in (PLACE, REMOVE):
+                order = Order(
+                    asset,
+                    "buy" if flags & BUY else "sell",
+                    OrderType.STOP if flags & STOP else OrderType.LIMIT,
+                    amount,
+                    price,
+                )
+                if kind == PLACE:
+                    self.order_book.place(order)
+                else:
+                    self.order_book.remove(order)
+
+            self.sequence = sequence
+            self.time = max(self.time, t)
+            replayed = True
+
+        return replayed
+
+    def _append(self, kind: int, flags: int, asset: int, t: float, a=0.0, b=0.0):
+        if self._file is None:
+            # Unbuffered, so every record reaches the OS right away
+            self._file = open(self.journal_path, "ab", buffering=0)
+
+        self.sequence += 1
+        self.time = max(self.time, t)
+        self._file.write(RECORD.pack(self.sequence, kind, flags, asset, t, a, b))
+
+        self.records += 1
+        if self.records >= COMPACT_RECORDS:
+            self.compact()
+
+    def trade(self, i: int, side: str, amount: float, price: float, t: float):
+        self._append(TRADE, BUY if side == "buy" else 0, i, t, amount, price)
+
+    def order(self, change: str, order: Order):
+        # `change` is either "place" or "remove"
+        self._append(
+            PLACE if change == "place" else REMOVE,
+            (BUY if order.side == "buy" else 0)
+            | (STOP if order.order_type == OrderType.STOP else 0),
+            order.asset,
+            self.time,
+            order.amount,
+            order.price,
+        )
+
+    def checkpoint(self, t: float):
+        # Records the clock, at most every `CHECKPOINT_INTERVAL` seconds
+        now = time.monotonic()
+        if now - self._last_checkpoint >= CHECKPOINT_INTERVAL:
+            self._last_checkpoint = now
+            self._append(CLOCK, 0, 0, t)
+
+    def compact(self, t: Optional[float] = None):
+        if t is not None:
+            self.time = t
+
+        orders = self.order_book
+        data = b"".join(
+            [
+                SNAPSHOT_HEAD.pack(
+                    SNAPSHOT_MAGIC,
+                    SNAPSHOT_VERSION,
+                    self.sequence,
+                    self.time,
+                    self.portfolio.balance,
+                    len(self.portfolio.assets),
+                ),
+                numpy.stack(
+                    [
+                        self.portfolio.invested_money,
+                        self.portfolio.invested_amount,
+                        self.portfolio.returned_money,
+                        self.portfolio.returned_amount,
+                    ]
+                )
+                .astype("<f8")
+                .tobytes(),
+                struct.pack("<I", len(orders)),
+                *(
+                    ORDER.pack(
+                        order.asset,
+                        order.side == "buy",
+                        order.order_type == OrderType.STOP,
+                        order.amount,
+                        order.price,
+                    )
+                    for order in map(orders.order, range(len(orders)))
+                ),
+            ]
+        )
+
+        tmp = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+
+        # Only emptied once the snapshot is in place
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, "wb", buffering=0)
+        self.records = 0
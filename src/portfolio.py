@@ -0,0 +1,150 @@
+import math
+from typing import Iterable, List
+
+import numpy
+
+from . import utils
+from .asset import Asset
+
+
+# Every trade in the order it was made, as a list per field, with what it did to the
+# amount owned of the asset and to the balance (so negative for selling and buying
+# respectively)
+class Ledger:
+    def __init__(self):
+        self.times: List[float] = []
+        self.asset_ids: List[int] = []
+        self.amounts: List[float] = []
+        self.money: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def add(self, t: float, i: int, side: str, amount: float, money: float):
+        self.times.append(float(t))
+        self.asset_ids.append(i)
+        self.amounts.append(amount if side == "buy" else -amount)
+        self.money.append(-money if side == "buy" else money)
+
+    def add_records(self, assets: List[Asset], records: Iterable[dict]):
+        # Trade log records (see `tradelog`), in order of sim time. Those of assets
+        # that aren't around are left out.
+        symbol_ids = {asset.symbol: i for i, asset in enumerate(assets)}
+        records = [record for record in records if record["symbol"] in symbol_ids]
+
+        for record in sorted(records, key=lambda record: record["time"]):
+            self.add(
+                record["time"],
+                symbol_ids[record["symbol"]],
+                record["action"],
+                record["amount"],
+                record["balance"],
+            )
+
+
+# Cash plus what's been put into and taken out of every asset, kept as one array
+# per field (indexed like `assets`) so the whole portfolio can be valued at once
+class Portfolio:
+    def __init__(self, assets: List[Asset], balance=1000000.0):
+        self.assets = assets
+        self.balance = balance
+
+        self.invested_money = numpy.zeros(len(assets))
+        self.invested_amount = numpy.zeros(len(assets))
+        self.returned_money = numpy.zeros(len(assets))
+        self.returned_amount = numpy.zeros(len(assets))
+
+        self.journal = None  # Told about every trade, see `persistence.Journal`
+        # Trades made from here on, after whatever history it was started with
+        self.ledger = Ledger()
+
+    @property
+    def owned_amount(self) -> numpy.ndarray:
+        return self.invested_amount - self.returned_amount
+
+    def apply(self, i: int, side: str, amount: float, price: float):
+        # Just the bookkeeping of a trade, without any checks
+        self.apply_money(i, side, amount, amount * price)
+
+    def apply_money(self, i: int, side: str, amount: float, money: float):
+        # Same, for a trade worth `money` in total (as trade logs have it)
+        if side == "buy":
+            self.balance -= money
+            self.invested_money[i] += money
+            self.invested_amount[i] += amount
+        else:
+            self.balance += money
+            self.returned_money[i] += money
+            self.returned_amount[i] += amount
+
+    def _trade(self, i: int, side: str, amount: float, price: float, t: float):
+        self.apply(i, side, amount, price)
+        self.ledger.add(t, i, side, amount, amount * price)
+        if self.journal is not None:
+            self.journal.trade(i, side, amount, price, t)
+
+        utils.log(
+            time=t,
+            symbol=self.assets[i].symbol,
+            action=side,
+            amount=amount,
+            balance=amount * price,
+        )
+
+    def buy(self, i: int, amount: float, t: float) -> bool:
+        # Whether the order went through, which needs a price and enough balance
+        price = self.assets[i].price(t)
+        if math.isnan(price) or amount * price > self.balance:
+            return False
+
+        self._trade(i, "buy", amount, price, t)
+        return True
+
+    def sell(self, i: int, amount: float, t: float) -> bool:
+        # Whether the order went through, which needs a price and enough owned
+        price = self.assets[i].price(t)
+        if math.isnan(price) or amount > self.owned_amount[i]:
+            return False
+
+        self._trade(i, "sell", amount, price, t)
+        return True
+
+    def prices_many(self, ts: numpy.ndarray) -> numpy.ndarray:
+        # Last known price of every asset at every timestamp, shaped (assets, ts)
+        ts = numpy.asarray(ts, dtype=numpy.float64)
+        return numpy.stack([asset.last_price_many(ts) for asset in self.assets])
+
+    def value_many(self, ts: numpy.ndarray) -> numpy.ndarray:
+        # What the current holdings would be worth at every timestamp, cash included.
+        # Assets that aren't owned don't count, even if they have no price yet.
+        owned = self.owned_amount
+        prices = self.prices_many(ts)
+        worth = numpy.where(owned[:, None] != 0, owned[:, None] * prices, 0.0)
+
+        return self.balance + worth.sum(axis=0)
+
+    def value(self, t: float) -> float:
+        return float(self.value_many([t])[0])
+
+    def to_dict(self) -> dict:
+        return {
+            "balance": self.balance,
+            "assets": {
+                i: {
+                    "invested_money": self.invested_money[i],
+                    "invested_amount": self.invested_amount[i],
+                    "returned_money": self.returned_money[i],
+                    "returned_amount": self.returned_amount[i],
+                }
+                for i in range(len(self.assets))
+            },
+        }
+
+    def load_dict(self, di: dict):
+        self.balance = di["balance"]
+
+        for i, asset in di["assets"].items():
+            self.invested_money[int(i)] = asset["invested_money"]
+            self.invested_amount[int(i)] = asset["invested_amount"]
+            self.returned_money[int(i)] = asset["returned_money"]
+            self.returned_amount[int(i)] = asset["returned_amount"]
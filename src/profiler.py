@@ -0,0 +1,106 @@
+import csv
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy
+
+from . import utils
+
+
+PROFILE_PATH = utils.DIR / "profile.csv"
+
+
+# Times the stages of every frame into ring buffers holding the last `size` frames.
+# A frame goes `begin()`, then `lap(stage)` at the end of each stage, which charges
+# everything since the previous lap to it, then `end()`. Stages can come up more
+# than once a frame, or not at all. While disabled, all of these return straight
+# away.
+class Profiler:
+    def __init__(self, size=300):
+        self.size = size
+        self.enabled = False
+        self.clear()
+
+    def clear(self):
+        self.frames = 0  # Recorded so far
+        self.totals = numpy.zeros(self.size)  # Seconds from one begin to its end
+        self.stages: Dict[str, numpy.ndarray] = {}  # Seconds per stage
+
+        self._times: Dict[str, float] = {}
+        self._begun = False  # Only frames begun while enabled get recorded
+        self._start = 0.0
+        self._last = 0.0
+
+    def toggle(self):
+        # Starts over every time it's turned on
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.clear()
+
+    def begin(self):
+        if self.enabled:
+            self._times.clear()
+            self._begun = True
+            self._start = self._last = time.perf_counter()
+
+    def lap(self, stage: str):
+        if self.enabled:
+            now = time.perf_counter()
+            self._times[stage] = self._times.get(stage, 0.0) + now - self._last
+            self._last = now
+
+    def end(self):
+        if not (self.enabled and self._begun):
+            return
+
+        slot = self.frames % self.size
+        for stage in self._times:
+            if stage not in self.stages:
+                self.stages[stage] = numpy.zeros(self.size)
+        for stage, ring in self.stages.items():
+            ring[slot] = self._times.get(stage, 0.0)
+
+        self.totals[slot] = time.perf_counter() - self._start
+        self.frames += 1
+
+    def _ordered(self, ring: numpy.ndarray) -> numpy.ndarray:
+        # The recorded part of a ring buffer, oldest first
+        if self.frames < self.size:
+            return ring[: self.frames]
+
+        return numpy.roll(ring, -(self.frames % self.size))
+
+    def fps(self) -> float:
+        totals = self._ordered(self.totals)
+        return 1 / totals.mean() if len(totals) and totals.mean() > 0 else 0.0
+
+    def stats(self) -> Dict[str, Tuple[float, float, float]]:
+        # 50th and 95th percentile and maximum of every stage, in seconds
+        if self.frames == 0:
+            return {}
+
+        return {
+            stage: tuple(numpy.percentile(self._ordered(ring), [50, 95, 100]).tolist())
+            for stage, ring in self.stages.items()
+        }
+
+    def lines(self) -> List[str]:
+        # `stats()` as text, in milliseconds
+        return [f"FPS {self.fps():6.1f} | p50 / p95 / max ms"] + [
+            f"{stage:<13} {p50 * 1000:7.2f} {p95 * 1000:7.2f} {peak * 1000:7.2f}"
+            for stage, (p50, p95, peak) in self.stats().items()
+        ]
+
+    def export(self, path: Path = PROFILE_PATH):
+        # One row per recorded frame, oldest first, with seconds per stage
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "total", *self.stages])
+
+            first = max(self.frames - self.size, 0)
+            columns = [self._ordered(self.totals)] + [
+                self._ordered(ring) for ring in self.stages.values()
+            ]
+            for i, row in enumerate(zip(*(column.tolist() for column in columns))):
+                writer.writerow([first + i, *row])
@@ -0,0 +1,102 @@
+from typing import List, Tuple
+
+import numpy
+
+
+# Per-bucket aggregates of a price grid at every power-of-two bucket size. Level `k`
+# holds the open, low, high and close of each run of `2 ** k` grid slots, level 0
+# being the grid itself, so any range of slots can be summarized by combining at
+# most two buckets per level.
+class Pyramid:
+    def __init__(self, grid: numpy.ndarray, levels: List[numpy.ndarray]):
+        self.grid = grid
+        # levels[k - 1] is an array of shape (4, n): opens, lows, highs, closes
+        self.levels = levels
+
+    @classmethod
+    def build(cls, grid: numpy.ndarray) -> "Pyramid":
+        levels = []
+
+        opens = lows = highs = closes = grid
+        while len(opens) > 1:
+            if len(opens) % 2:
+                opens, lows, highs, closes = (
+                    numpy.append(a, numpy.nan) for a in (opens, lows, highs, closes)
+                )
+
+            level = numpy.empty((4, len(opens) // 2))
+            # First and last non-NaN price of both halves
+            numpy.copyto(level[0], opens[0::2])
+            numpy.copyto(level[0], opens[1::2], where=numpy.isnan(opens[0::2]))
+            numpy.fmin(lows[0::2], lows[1::2], out=level[1])
+            numpy.fmax(highs[0::2], highs[1::2], out=level[2])
+            numpy.copyto(level[3], closes[1::2])
+            numpy.copyto(level[3], closes[0::2], where=numpy.isnan(closes[1::2]))
+
+            levels.append(level)
+            opens, lows, highs, closes = level
+
+        return cls(grid, levels)
+
+    def query(
+        self, lo: numpy.ndarray, hi: numpy.ndarray
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        # Open, low, high and close over the grid slots [lo, hi), for every pair.
+        # Walks up the levels taking the odd bucket off either end of each range,
+        # like a bottom-up segment tree, so it's exact and costs O(log(hi - lo)).
+        lo = numpy.clip(numpy.asarray(lo, dtype=numpy.int64), 0, len(self.grid))
+        hi = numpy.clip(numpy.asarray(hi, dtype=numpy.int64), 0, len(self.grid))
+
+        lows = numpy.full(lo.shape, numpy.nan)
+        highs = numpy.full(lo.shape, numpy.nan)
+        # Leftmost/rightmost prices seen from either end of the range
+        left_open = numpy.full(lo.shape, numpy.nan)
+        left_close = numpy.full(lo.shape, numpy.nan)
+        right_open = numpy.full(lo.shape, numpy.nan)
+        right_close = numpy.full(lo.shape, numpy.nan)
+
+        level = 0
+        while True:
+            active = lo < hi
+            if not active.any():
+                break
+
+            if level == 0:
+                opens = lows_k = highs_k = closes = self.grid
+            else:
+                opens, lows_k, highs_k, closes = self.levels[level - 1]
+
+            # Odd bucket on the left end, these come in left to right order
+            take = active & (lo & 1 == 1)
+            i = lo[take]
+            lows[take] = numpy.fmin(lows[take], lows_k[i])
+            highs[take] = numpy.fmax(highs[take], highs_k[i])
+            left_open[take] = numpy.where(
+                numpy.isnan(left_open[take]), opens[i], left_open[take]
+            )
+            left_close[take] = numpy.where(
+                numpy.isnan(closes[i]), left_close[take], closes[i]
+            )
+            lo[take] += 1
+
+            # Odd bucket on the right end, these come in right to left order
+            take = active & (lo < hi) & (hi & 1 == 1)
+            hi[take] -= 1
+            i = hi[take]
+            lows[take] = numpy.fmin(lows[take], lows_k[i])
+            highs[take] = numpy.fmax(highs[take], highs_k[i])
+            right_close[take] = numpy.where(
+                numpy.isnan(right_close[take]), closes[i], right_close[take]
+            )
+            right_open[take] = numpy.where(
+                numpy.isnan(opens[i]), right_open[take], opens[i]
+            )
+
+            lo >>= 1
+            hi >>= 1
+            level += 1
+
+        opens = numpy.where(numpy.isnan(left_open), right_open, left_open)
+        closes = numpy.where(numpy.isnan(right_close), left_close, right_close)
+
+        return opens, lows, highs, closes
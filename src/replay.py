@@ -0,0 +1,121 @@
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy
+
+from . import tradelog
+from .asset import Asset
+from .portfolio import Ledger, Portfolio
+
+
+# Every this many trades, the portfolio's state is kept, so seeking anywhere only
+# has to replay the trades since the checkpoint before it
+CHECKPOINT_TRADES = 256
+
+
+# Plays back a trade log into a `Portfolio`. The trades are sorted by time, and the
+# state after every `CHECKPOINT_TRADES` of them is worked out up front, all in one
+# go by running sums. Moving forward applies the trades in between; jumping anywhere
+# else finds the checkpoint before it by binary search and goes forward from there.
+class Replay:
+    def __init__(
+        self,
+        assets: List[Asset],
+        records: Iterable[dict],
+        balance=1000000.0,
+        checkpoint_trades=CHECKPOINT_TRADES,
+    ):
+        symbol_ids = {asset.symbol: i for i, asset in enumerate(assets)}
+        # Trades of assets that aren't around are left out
+        records = [record for record in records if record["symbol"] in symbol_ids]
+        times = numpy.array([record["time"] for record in records], dtype=float)
+        order = numpy.argsort(times, kind="stable")
+
+        self.times = times[order]
+        self.asset_ids = numpy.array(
+            [symbol_ids[records[i]["symbol"]] for i in order], dtype=numpy.int64
+        )
+        self.buys = numpy.array([records[i]["action"] == "buy" for i in order])
+        self.amounts = numpy.array([records[i]["amount"] for i in order], dtype=float)
+        # The money each trade was worth
+        self.money = numpy.array([records[i]["balance"] for i in order], dtype=float)
+
+        # The whole log, trade by trade, e.g. for an `EquityCurve`
+        self.ledger = Ledger()
+        self.ledger.add_records(assets, records)
+
+        self.portfolio = Portfolio(assets, balance)
+        self.initial_balance = balance
+        self.position = 0  # Trades applied so far
+        self.checkpoint_trades = checkpoint_trades
+
+        self._build_checkpoints()
+
+    @classmethod
+    def from_log(cls, assets: List[Asset], path: Path, **kwargs) -> "Replay":
+        return cls(assets, tradelog.read(path), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def _build_checkpoints(self):
+        # Running totals of every field per asset at every checkpoint, from the sums
+        # over each stretch of trades between two of them
+        n = len(self)
+        assets = len(self.portfolio.assets)
+        count = n // self.checkpoint_trades + 1
+        keys = numpy.arange(n) // self.checkpoint_trades * assets + self.asset_ids
+
+        def totals(values: numpy.ndarray) -> numpy.ndarray:
+            sums = numpy.bincount(keys, values, count * assets).reshape(count, assets)
+            return numpy.concatenate(
+                (numpy.zeros((1, assets)), numpy.cumsum(sums, axis=0)[:-1])
+            )
+
+        sells = ~self.buys
+        self._invested_money = totals(numpy.where(self.buys, self.money, 0.0))
+        self._invested_amount = totals(numpy.where(self.buys, self.amounts, 0.0))
+        self._returned_money = totals(numpy.where(sells, self.money, 0.0))
+        self._returned_amount = totals(numpy.where(sells, self.amounts, 0.0))
+        self._balances = (
+            self.initial_balance
+            - self._invested_money.sum(axis=1)
+            + self._returned_money.sum(axis=1)
+        )
+
+    def _restore(self, checkpoint: int):
+        portfolio = self.portfolio
+        portfolio.balance = float(self._balances[checkpoint])
+        portfolio.invested_money[:] = self._invested_money[checkpoint]
+        portfolio.invested_amount[:] = self._invested_amount[checkpoint]
+        portfolio.returned_money[:] = self._returned_money[checkpoint]
+        portfolio.returned_amount[:] = self._returned_amount[checkpoint]
+
+        self.position = checkpoint * self.checkpoint_trades
+
+    def _apply(self, end: int):
+        # Trades [position, end), one by one
+        for i, buy, amount, money in zip(
+            self.asset_ids[self.position : end].tolist(),
+            self.buys[self.position : end].tolist(),
+            self.amounts[self.position : end].tolist(),
+            self.money[self.position : end].tolist(),
+        ):
+            self.portfolio.apply_money(i, "buy" if buy else "sell", amount, money)
+
+        self.position = end
+
+    def seek(self, t: float):
+        # The portfolio as it was right after every trade up to and including `t`
+        end = int(numpy.searchsorted(self.times, t, side="right"))
+
+        if not self.position <= end < self.position + self.checkpoint_trades:
+            self._restore(end // self.checkpoint_trades)
+
+        self._apply(end)
+
+    def start_time(self) -> float:
+        return float(self.times[0]) if len(self) else 0.0
+
+    def end_time(self) -> float:
+        return float(self.times[-1]) if len(self) else 0.0
@@ -0,0 +1,20 @@
+# Runs the simulation in fixed steps of real time, however often frames get drawn.
+# The time that passed is banked, and spent a whole step at a time, so the same
+# inputs always move the simulation along by the same amounts. If frames fall too
+# far behind, the backlog is dropped instead of stalling to catch up.
+class Scheduler:
+    def __init__(self, rate=120, max_lag=0.25):
+        self.step = 1 / rate  # In seconds of real time
+        self.max_lag = max_lag
+        self.lag = 0.0
+        self.steps = 0  # Taken so far
+
+    def advance(self, dt: float) -> int:
+        # How many steps to take for `dt` seconds having passed
+        self.lag = min(self.lag + dt, self.max_lag)
+
+        steps = int(self.lag // self.step)
+        self.lag -= steps * self.step
+        self.steps += steps
+
+        return steps
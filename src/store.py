@@ -0,0 +1,171 @@
+import json
+import os
+import struct
+from pathlib import Path
+from typing import List
+
+import numpy
+
+from . import utils
+from .asset import Asset, AssetType
+
+
+# Layout of the packed store:
+#
+#   MAGIC | version (u32) | header length (u32) | JSON header | padding | prices
+#
+# The header lists every asset with its symbol, type, source file, per-day offsets
+# and lengths, and where its prices start. Prices are raw little-endian float64s,
+# aligned so that they can be mapped straight into `Asset.prices` without a copy.
+MAGIC = b"TSASSETS"
+VERSION = 1
+ALIGNMENT = 64
+
+STORE_PATH = utils.DIR / "assets" / "assets.bin"
+
+ASSETS = [
+    # The file names are ambigious, as we don't want the participants to know
+    # which stock/crypto they're trading with.
+    ("AAPL", AssetType.STOCK, "A.npz"),
+    ("AMZN", AssetType.STOCK, "B.npz"),
+    ("META", AssetType.STOCK, "C.npz"),
+    ("TSLA", AssetType.STOCK, "D.npz"),
+    ("TWTR", AssetType.STOCK, "E.npz"),
+    ("BTC", AssetType.CRYPTO, "F.npz"),
+    ("DOGE", AssetType.CRYPTO, "G.npz"),
+    ("ETH", AssetType.CRYPTO, "H.npz"),
+    ("LTC", AssetType.CRYPTO, "I.npz"),
+    ("XMR", AssetType.CRYPTO, "J.npz"),
+]
+
+
+def _align(n: int) -> int:
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def pack(assets: List[Asset], path: Path = STORE_PATH):
+    entries = []
+    for asset in assets:
+        entries.append(
+            {
+                "symbol": asset.symbol,
+                "type": asset.asset_type.name,
+                "file": Path(asset.path).name,
+                "source": utils.file_stamp(asset.path),
+                "day_offsets": asset.day_offsets.tolist(),
+                "day_lengths": asset.day_lengths.tolist(),
+                "count": len(asset.prices),
+            }
+        )
+
+    # The data offsets depend on the header's own length, so settle it first with
+    # placeholders wide enough to hold any real offset.
+    for entry in entries:
+        entry["offset"] = 0xFFFFFFFFFFFF
+    data_start = _align(16 + len(json.dumps({"assets": entries}).encode("utf-8")))
+
+    offset = data_start
+    for entry in entries:
+        entry["offset"] = offset
+        offset = _align(offset + entry["count"] * 8)
+
+    header = json.dumps({"assets": entries}).encode("utf-8")
+
+    # Written next to the store and swapped in, so running instances that already
+    # mapped the old file keep reading consistent data. The temporary file is this
+    # process's own, as others may be packing the store at the same time.
+    tmp = Path(path).with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<II", VERSION, len(header)))
+            f.write(header)
+
+            for asset, entry in zip(assets, entries):
+                f.write(b"\0" * (entry["offset"] - f.tell()))
+                f.write(numpy.ascontiguousarray(asset.prices, dtype="<f8").tobytes())
+
+        os.replace(tmp, path)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def read_header(path: Path = STORE_PATH) -> dict:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a packed asset store")
+
+        version, length = struct.unpack("<II", f.read(8))
+        if version != VERSION:
+            raise ValueError(f"{path} has unsupported version {version}")
+
+        return json.loads(f.read(length).decode("utf-8"))
+
+
+def is_stale(path: Path = STORE_PATH, directory: Path = utils.DIR / "assets") -> bool:
+    try:
+        header = read_header(path)
+    except (OSError, ValueError):
+        return True
+
+    entries = {entry["symbol"]: entry for entry in header["assets"]}
+    for symbol, asset_type, file in ASSETS:
+        entry = entries.get(symbol)
+        if (
+            entry is None
+            or entry["type"] != asset_type.name
+            or entry["file"] != file
+            or entry["source"] != utils.file_stamp(directory / file)
+        ):
+            return True
+
+    return False
+
+
+def open_store(path: Path = STORE_PATH, directory: Path = utils.DIR / "assets"):
+    header = read_header(path)
+
+    # One read-only mapping for the whole file; every asset's prices are views into
+    # it, so the OS shares the pages between all processes reading the store.
+    data = numpy.memmap(path, dtype=numpy.uint8, mode="r")
+
+    assets = []
+    for entry in header["assets"]:
+        start = entry["offset"]
+        end = start + entry["count"] * 8
+
+        assets.append(
+            Asset(
+                entry["symbol"],
+                AssetType[entry["type"]],
+                directory / entry["file"],
+                prices=data[start:end].view("<f8"),
+                day_offsets=numpy.array(entry["day_offsets"], dtype=numpy.int64),
+            )
+        )
+
+    return assets
+
+
+def load_npz(directory: Path = utils.DIR / "assets") -> List[Asset]:
+    return [
+        Asset(symbol, asset_type, directory / file)
+        for symbol, asset_type, file in ASSETS
+    ]
+
+
+def load_assets(
+    path: Path = STORE_PATH, directory: Path = utils.DIR / "assets"
+) -> List[Asset]:
+    if is_stale(path, directory):
+        assets = load_npz(directory)
+
+        # Read-only installs (or the web build) just keep using the archives
+        try:
+            pack(assets, path)
+        except OSError:
+            return assets
+
+    assets = {asset.symbol: asset for asset in open_store(path, directory)}
+    return [assets[symbol] for symbol, _, _ in ASSETS]
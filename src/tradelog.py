@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+
+# Trade logs are written by `utils.log()` as JSON lines, one record per trade with
+# the wall clock time it happened at under "wall":
+#
+#   {"wall": 1671234567.89, "time": 640800.5, "symbol": "AAPL", "action": "buy", ...}
+#
+# Older logs are a run of `<wall clock time>:{...},` fragments instead, which are
+# still read here (and can be converted with `convert()`).
+#
+# Next to a JSON lines log, `index()` keeps a `.idx` sidecar with the byte offset
+# of every record by symbol and sim day, so that one asset's trades on one day can
+# be read without going through the whole log.
+
+
+def is_legacy(path: Path) -> bool:
+    return Path(path).suffix == ".txt"
+
+
+def _read_legacy(path: Path, chunk_size=1 << 16) -> Iterator[dict]:
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        eof = False
+
+        while True:
+            buffer = buffer.lstrip()
+            colon = buffer.find(":")
+
+            try:
+                if colon < 0:
+                    raise ValueError
+                record, end = decoder.raw_decode(buffer, colon + 1)
+                if end >= len(buffer) and not eof:
+                    # Can't tell whether the trailing comma is there yet
+                    raise ValueError
+            except ValueError:
+                if eof:
+                    if buffer.strip():
+                        raise ValueError(f"{path} has a truncated record at the end")
+                    return
+
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+
+            record["wall"] = float(buffer[:colon])
+            yield record
+
+            buffer = buffer[end:].lstrip()
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+
+
+def _read_lines(path: Path) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _index_path(path: Path) -> Path:
+    return Path(path).with_suffix(Path(path).suffix + ".idx")
+
+
+def _fingerprint(path: Path, size: int, block=4096) -> list:
+    # Inode, and hashes of the first and last `block` bytes of the first `size`
+    # bytes, to tell whether those are still what was indexed. The log's mtime
+    # changes with every record appended, so it can't tell that on its own.
+    with open(path, "rb") as f:
+        head = f.read(min(block, size))
+        f.seek(max(size - block, 0))
+        tail = f.read(size - max(size - block, 0))
+
+        return [
+            os.fstat(f.fileno()).st_ino,
+            hashlib.sha1(head).hexdigest(),
+            hashlib.sha1(tail).hexdigest(),
+        ]
+
+
+def index(path: Path) -> Dict[str, Dict[str, List[int]]]:
+    # {symbol: {day: [offsets]}}, brought up to date with the log first. Records
+    # appended since the last call are indexed from where it left off, but if the
+    # part indexed before changed (e.g. the log was replaced), it starts over.
+    path = Path(path)
+    size = os.path.getsize(path)
+
+    try:
+        with open(_index_path(path), "r", encoding="utf-8") as f:
+            idx = json.load(f)
+        if idx["size"] > size or idx["fingerprint"] != _fingerprint(
+            path, idx["size"]
+        ):
+            raise ValueError
+    except (OSError, ValueError, KeyError):
+        idx = {"size": 0, "symbols": {}}
+
+    if idx["size"] == size:
+        return idx["symbols"]
+
+    with open(path, "rb") as f:
+        f.seek(idx["size"])
+        offset = idx["size"]
+
+        for line in f:
+            # Only index whole lines, a partial one gets picked up next time
+            if not line.endswith(b"\n"):
+                break
+
+            if line.strip():
+                record = json.loads(line)
+                day = str(int(record["time"] // 86400))
+                idx["symbols"].setdefault(record["symbol"], {}).setdefault(
+                    day, []
+                ).append(offset)
+
+            offset += len(line)
+
+    idx["size"] = offset
+    idx["fingerprint"] = _fingerprint(path, offset)
+
+    try:
+        with open(_index_path(path), "w", encoding="utf-8") as f:
+            json.dump(idx, f)
+    except OSError:
+        pass
+
+    return idx["symbols"]
+
+
+def read(
+    path: Path, symbol: Optional[str] = None, day: Optional[int] = None
+) -> Iterator[dict]:
+    # Streams the log's records, optionally only those of one symbol and/or sim day
+    if is_legacy(path):
+        records = _read_legacy(path)
+    elif symbol is None:
+        records = _read_lines(path)
+    else:
+        records = _read_indexed(path, symbol, day)
+
+    for record in records:
+        if symbol is not None and record["symbol"] != symbol:
+            continue
+        if day is not None and int(record["time"] // 86400) != day:
+            continue
+
+        yield record
+
+
+def _read_indexed(path: Path, symbol: str, day: Optional[int]) -> Iterator[dict]:
+    days = index(path).get(symbol, {})
+    if day is None:
+        offsets = sorted(offset for offsets in days.values() for offset in offsets)
+    else:
+        offsets = days.get(str(day), [])
+
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            yield json.loads(f.readline())
+
+
+def convert(src: Path, dst: Path):
+    with open(dst, "w", encoding="utf-8") as f:
+        for record in _read_legacy(src):
+            f.write(json.dumps(record) + "\n")
+
+
+def find_logs(directory: Path) -> List[Path]:
+    # Every log in `directory`, skipping old ones that were already converted
+    logs = sorted(Path(directory).glob("*.jsonl"))
+    stems = {log.stem for log in logs}
+    logs += [
+        log for log in sorted(Path(directory).glob("*.txt")) if log.stem not in stems
+    ]
+
+    return logs
@@ -0,0 +1,194 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy
+
+
+def _scan(a: numpy.ndarray, b: numpy.ndarray) -> numpy.ndarray:
+    # `x[i] = a[i] * x[i - 1] + b[i]` for every `i`, starting from `x[-1] = 0`. Each
+    # round combines every step with the one `shift` before it, doubling how far
+    # back they reach, so it only takes log2(n) rounds over whole arrays.
+    a = a.astype(numpy.float64)
+    b = b.astype(numpy.float64)
+
+    shift = 1
+    while shift < len(a):
+        b[shift:] = a[shift:] * b[:-shift] + b[shift:]
+        a[shift:] = a[shift:] * a[:-shift]
+        shift *= 2
+
+    return b
+
+
+# The trades of every respondent in one place, as a column per field, sorted by
+# symbol and then time. Each symbol's trades are a contiguous run, so the trades
+# of a symbol within a span of time are found by binary search, and totals per
+# respondent and symbol come out of `numpy.bincount` instead of nested loops.
+class TradeStore:
+    def __init__(
+        self,
+        respondents: List[str],
+        symbols: List[str],
+        records: List[dict],
+        respondent_ids: numpy.ndarray,
+        symbol_ids: numpy.ndarray,
+        log_order: numpy.ndarray,
+    ):
+        self.respondents = respondents
+        self.symbols = symbols
+        self.records = records  # The log records themselves, in the same order
+
+        self.respondent_ids = respondent_ids
+        self.symbol_ids = symbol_ids
+        # Where each trade came in the logs, one respondent after another
+        self.log_order = log_order
+        self.times = numpy.array([record["time"] for record in records], dtype=float)
+        self.buys = numpy.array(
+            [record["action"] == "buy" for record in records], dtype=bool
+        )
+        self.amounts = numpy.array(
+            [record["amount"] for record in records], dtype=float
+        )
+        self.balances = numpy.array(
+            [record["balance"] for record in records], dtype=float
+        )
+
+        # Symbol `i`'s trades are [symbol_starts[i], symbol_starts[i + 1])
+        self.symbol_starts = numpy.searchsorted(
+            self.symbol_ids, numpy.arange(len(symbols) + 1)
+        )
+
+    @classmethod
+    def from_logs(
+        cls, respondents: Dict[str, Iterable[dict]], symbols: List[str]
+    ) -> "TradeStore":
+        # Trades of symbols that aren't in `symbols` are left out
+        symbol_ids = {symbol: i for i, symbol in enumerate(symbols)}
+
+        records = []
+        respondent_ids = []
+        for i, entries in enumerate(respondents.values()):
+            for entry in entries:
+                if entry["symbol"] in symbol_ids:
+                    records.append(entry)
+                    respondent_ids.append(i)
+
+        respondent_ids = numpy.array(respondent_ids, dtype=numpy.int64)
+        record_symbols = numpy.array(
+            [symbol_ids[record["symbol"]] for record in records], dtype=numpy.int64
+        )
+        times = numpy.array([record["time"] for record in records], dtype=float)
+
+        # Stable, so trades at the same time keep their order in the logs
+        order = numpy.lexsort((times, record_symbols))
+
+        return cls(
+            list(respondents),
+            symbols,
+            [records[i] for i in order],
+            respondent_ids[order],
+            record_symbols[order],
+            order,
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def between(self, symbol: int, t0: float, t1: float) -> slice:
+        # The trades of symbol `symbol` made within [t0, t1]
+        start, end = self.symbol_starts[symbol], self.symbol_starts[symbol + 1]
+        times = self.times[start:end]
+
+        return slice(
+            start + numpy.searchsorted(times, t0, side="left"),
+            start + numpy.searchsorted(times, t1, side="right"),
+        )
+
+    def trade_pnl(self) -> numpy.ndarray:
+        # Profit of every trade, from what was sold against the average cost of what
+        # the respondent owned of the symbol right before, zero for buys. Over the
+        # trades grouped by respondent and symbol, the amount owned and its cost
+        # both follow `x = a * x + b` from one trade to the next, which `_scan()`
+        # works out for all of them at once. Selling scales the cost by the fraction
+        # kept, buying adds to it, and selling everything (or more than what's
+        # owned) starts over from nothing.
+        keys = self.respondent_ids * len(self.symbols) + self.symbol_ids
+        order = numpy.argsort(keys, kind="stable")  # Still in time order per group
+        keys = keys[order]
+        buys = self.buys[order]
+        amounts = self.amounts[order]
+        balances = self.balances[order]
+
+        def before(values: numpy.ndarray) -> numpy.ndarray:
+            # Each trade's value from the trade before it in its group
+            return numpy.where(starts, 0.0, numpy.roll(values, 1))
+
+        starts = numpy.diff(keys, prepend=-1) != 0
+        owned = _scan(
+            numpy.where(starts, 0.0, 1.0), numpy.where(buys, amounts, -amounts)
+        )
+        owned_before = before(owned)
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            kept = numpy.where(owned_before > 0, owned / owned_before, 0.0)
+        kept = numpy.where(buys, 1.0, numpy.where(kept > 1e-9, kept, 0.0))
+
+        cost = _scan(numpy.where(starts, 0.0, kept), numpy.where(buys, balances, 0.0))
+        cost_before = before(cost)
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            average = numpy.where(owned_before > 0, cost_before / owned_before, 0.0)
+
+        pnl = numpy.empty(len(self))
+        pnl[order] = numpy.where(buys, 0.0, balances - amounts * average)
+        return pnl
+
+    def realized_pnl(self, mask: Optional[numpy.ndarray] = None) -> numpy.ndarray:
+        # `trade_pnl()` summed per respondent and symbol, shaped (respondents,
+        # symbols), over the trades in `mask` (all by default). The cost of what was
+        # sold always comes from every trade before it, in `mask` or not.
+        if mask is None:
+            mask = numpy.ones(len(self), dtype=bool)
+
+        size = len(self.respondents) * len(self.symbols)
+        keys = self.respondent_ids * len(self.symbols) + self.symbol_ids
+
+        return numpy.bincount(keys[mask], self.trade_pnl()[mask], size).reshape(
+            len(self.respondents), len(self.symbols)
+        )
+
+    def totals(self, weights: Optional[numpy.ndarray] = None) -> dict:
+        # {respondent: {symbol: {"buy_acts": ..., ..., "realized_pnl": ...}}} for the
+        # respondents with any trades, each trade counted `weights` times (once by
+        # default, zero to leave it out)
+        if weights is None:
+            weights = numpy.ones(len(self))
+
+        size = len(self.respondents) * len(self.symbols)
+        keys = self.respondent_ids * len(self.symbols) + self.symbol_ids
+        shape = (len(self.respondents), len(self.symbols))
+
+        def total(values: numpy.ndarray) -> numpy.ndarray:
+            return numpy.bincount(keys, values * weights, size).reshape(shape)
+
+        sells = ~self.buys
+        columns = {
+            "buy_acts": total(self.buys).astype(numpy.int64),
+            "sell_acts": total(sells).astype(numpy.int64),
+            "buy_amount": total(numpy.where(self.buys, self.amounts, 0.0)),
+            "sell_amount": total(numpy.where(sells, self.amounts, 0.0)),
+            "buy_balance": total(numpy.where(self.buys, self.balances, 0.0)),
+            "sell_balance": total(numpy.where(sells, self.balances, 0.0)),
+            "realized_pnl": self.realized_pnl(weights > 0),
+        }
+
+        active = numpy.bincount(
+            self.respondent_ids, weights, len(self.respondents)
+        ).nonzero()[0]
+
+        return {
+            self.respondents[r]: {
+                symbol: {name: column[r, s].item() for name, column in columns.items()}
+                for s, symbol in enumerate(self.symbols)
+            }
+            for r in active
+        }
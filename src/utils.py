@@ -1,16 +1,37 @@
+import atexit
+import functools
 import json
+import os
 import sys
+import threading
 import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple
 
-import pygame
+if TYPE_CHECKING:
+    import pygame
 
 
 WEB = sys.platform == "emscripten"
 DIR = Path(".")
+CACHE_DIR = DIR / "assets" / "cache"
 
-SMALL_FONT = pygame.font.Font(DIR / "assets" / "VeraMono.ttf", 16)
-LARGE_FONT = pygame.font.Font(DIR / "assets" / "VeraMono.ttf", 32)
+# Point sizes of `SMALL_FONT` and `LARGE_FONT`. They're only loaded the first time
+# they're asked for, so everything else in here (and the data and accounting
+# modules using it) can be imported without pygame.
+FONT_PATH = DIR / "assets" / "VeraMono.ttf"
+FONT_SIZES = {"SMALL_FONT": 16, "LARGE_FONT": 32}
+
+
+def __getattr__(name: str):
+    if name in FONT_SIZES:
+        import pygame
+
+        pygame.font.init()
+        font = globals()[name] = pygame.font.Font(FONT_PATH, FONT_SIZES[name])
+        return font
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def caesar(text: str, shift=3):
@@ -22,15 +43,104 @@ def caesar(text: str, shift=3):
     )
 
 
+# Rendered text is cached, as most of it (axis labels, the HUD) comes out the same
+# frame after frame. The surfaces are shared, so they must not be drawn onto.
+# `render.cache_info()` tells the hits and misses.
+@functools.lru_cache(maxsize=1024)
+def render(
+    font: "pygame.font.Font",
+    text: str,
+    color: Tuple[int, ...],
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+) -> "pygame.Surface":
+    import pygame
+
+    surface = font.render(text, True, color)
+
+    # Scaled to the given width or height, keeping the aspect ratio
+    if width is not None:
+        surface = pygame.transform.scale(
+            surface, (width, int(surface.get_height() * width / surface.get_width()))
+        )
+    elif height is not None:
+        surface = pygame.transform.scale(
+            surface, (int(surface.get_width() * height / surface.get_height()), height)
+        )
+
+    return surface
+
+
+def file_stamp(path: Path) -> list:
+    # Cheap stand-in for the file's contents, to tell whether a cache is stale
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
 def lerp(x: float, x1: float, x2: float, y1: float, y2: float) -> float:
     return y1 + (x - x1) * (y2 - y1) / (x2 - x1)
 
 
+# Log records are queued up and written out in batches by a background thread,
+# once enough of them pile up or every so often, whichever comes first. There are
+# no threads on the web, so there it's done right away when either is due. See
+# `tradelog` for the format and reading them back.
+LOG_PATH = "log.jsonl"
+LOG_FLUSH_SIZE = 256
+LOG_FLUSH_INTERVAL = 1.0  # Seconds
+
+_log_queue = []
+_log_lock = threading.Lock()  # Guards `_log_queue`
+_log_write_lock = threading.Lock()  # Keeps flushes in order
+_log_wakeup = threading.Event()
+_log_thread = None
+_log_flushed_at = time.monotonic()
+
+
+def flush_log():
+    global _log_flushed_at
+
+    with _log_write_lock:
+        with _log_lock:
+            records = _log_queue[:]
+            _log_queue.clear()
+            _log_flushed_at = time.monotonic()
+
+        if records:
+            with open(LOG_PATH, "a") as f:
+                f.write("".join(records))
+
+
+def _log_writer():
+    while True:
+        _log_wakeup.wait(LOG_FLUSH_INTERVAL)
+        _log_wakeup.clear()
+        flush_log()
+
+
 def log(**kwargs):
-    with open("log.txt", "a") as f:
-        f.write(f"{time.time()}:")
-        json.dump(kwargs, f)
-        f.write(",")
+    global _log_thread
+
+    with _log_lock:
+        _log_queue.append(json.dumps({"wall": time.time(), **kwargs}) + "\n")
+        due = (
+            len(_log_queue) >= LOG_FLUSH_SIZE
+            or time.monotonic() - _log_flushed_at >= LOG_FLUSH_INTERVAL
+        )
+
+    if WEB:
+        if due:
+            flush_log()
+        return
+
+    if _log_thread is None:
+        _log_thread = threading.Thread(target=_log_writer, daemon=True)
+        _log_thread.start()
+    if due:
+        _log_wakeup.set()
+
+
+atexit.register(flush_log)
 
 
 def to_time(secs: int, with_days=False):
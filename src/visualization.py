@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy
+import pygame
+
+from . import store, utils
+from .asset import NPZ_INTERVAL, STOCK_TIME_OFFSET, Asset
+from .chart import Chart
+from .tradestore import TradeStore
+
+
+# Bump whenever the images come out differently, so `--only-changed` redraws them
+VERSION = 1
+
+OUT_DIR = utils.DIR / "visualizations" / "days"
+MANIFEST_PATH = OUT_DIR / "manifest.json"
+
+# (symbol, day, [(respondent, log record)]) for every image
+Job = Tuple[str, int, List[Tuple[str, dict]]]
+
+
+def day_range(asset: Asset, day: int) -> Tuple[float, float]:
+    # The span of time a day's image covers
+    x_min = day * 3600 * 24
+    x_max = (day + 1) * 3600 * 24
+
+    if asset.is_stock():
+        x_min += STOCK_TIME_OFFSET
+        x_max -= 3600 * 24 - STOCK_TIME_OFFSET - len(asset.days[day]) * NPZ_INTERVAL
+
+    return x_min, x_max
+
+
+def jobs(assets: List[Asset], trades: TradeStore) -> List[Job]:
+    # Each day of each asset, with the trades that fall on it
+    result = []
+    for i, asset in enumerate(assets):
+        for day in range(len(asset.days)):
+            found = trades.between(i, *day_range(asset, day))
+            # Drawn in the order they're in the logs
+            found = found.start + numpy.argsort(trades.log_order[found])
+            result.append(
+                (
+                    asset.symbol,
+                    day,
+                    [
+                        (
+                            trades.respondents[trades.respondent_ids[j]],
+                            trades.records[j],
+                        )
+                        for j in found.tolist()
+                    ],
+                )
+            )
+
+    return result
+
+
+def image_path(job: Job, out_dir: Path = OUT_DIR) -> Path:
+    symbol, day, _ = job
+    return Path(out_dir) / f"{symbol}-{day}.png"
+
+
+def job_hash(job: Job, stamps: Dict[str, list]) -> str:
+    # Covers everything that goes into the job's image
+    symbol, day, trades = job
+    return hashlib.sha1(
+        json.dumps([VERSION, stamps[symbol], day, trades]).encode()
+    ).hexdigest()
+
+
+_worker_assets: Dict[str, Asset] = {}
+_worker_chart: Optional[Chart] = None
+
+
+def _init_worker():
+    global _worker_chart
+
+    # No window is ever opened, the charts are only drawn onto surfaces
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.init()
+
+    _worker_assets.update((asset.symbol, asset) for asset in store.load_assets())
+    _worker_chart = Chart(
+        lambda x: 0,
+        1980,
+        720,
+        x_repr=lambda x: utils.to_time(x, False),
+        y_repr=lambda y: f"${y:.2f}",
+        fg_color=(0, 0, 0, 255),
+        nan_bg_color=(0, 0, 0, 0),
+    )
+
+
+def render(job: Job, out_dir: Path = OUT_DIR):
+    symbol, day, trades = job
+    asset = _worker_assets[symbol]
+    chart = _worker_chart
+
+    chart.data_lambda = asset.price
+    chart.data_many_lambda = asset.price_many
+    chart.scale_x_min, chart.scale_x_max = day_range(asset, day)
+    chart.adjust_scale()
+    chart.line_chart()
+
+    for respondent, entry in trades:
+        ax = entry["time"]
+        x = utils.lerp(
+            ax,
+            chart.scale_x_min,
+            chart.scale_x_max,
+            chart.y_margin,
+            chart.width,
+        )
+
+        ay = asset.price(ax)
+        y = utils.lerp(
+            ay,
+            chart.scale_y_min,
+            chart.scale_y_max,
+            chart.height - chart.x_margin,
+            0,
+        )
+
+        pygame.draw.circle(chart.surface, (0, 0, 0, 255), (x, y), 2)
+        chart.surface.blit(
+            text := utils.render(utils.SMALL_FONT, respondent, (0, 0, 0, 128)),
+            (x + 3, y - text.get_height()),
+        )
+        chart.surface.blit(
+            text := utils.render(
+                utils.SMALL_FONT,
+                f"{'BUY' if entry['action'] == 'buy' else 'SELL'} {entry['amount']}",
+                (0, 128, 0, 128) if entry["action"] == "buy" else (128, 0, 0, 128),
+            ),
+            (x + 3, y),
+        )
+
+    pygame.image.save(chart.surface, str(image_path(job, out_dir)))
+
+
+def render_all(
+    assets: List[Asset],
+    respondents: Dict[str, List[dict]],
+    only_changed=False,
+    processes: Optional[int] = None,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+) -> dict:
+    # Draws every day of every asset over a pool of processes, each with its own
+    # mapping of the asset store. Returns the trade totals of every respondent
+    # (see `TradeStore.totals()`).
+    # `progress(done, total, skipped)` is called as images get finished.
+    trades = TradeStore.from_logs(respondents, [asset.symbol for asset in assets])
+    all_jobs = jobs(assets, trades)
+    stamps = {asset.symbol: utils.file_stamp(asset.path) for asset in assets}
+    hashes = {str(image_path(job)): job_hash(job, stamps) for job in all_jobs}
+
+    manifest = {}
+    if only_changed:
+        try:
+            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    todo = [
+        job
+        for job in all_jobs
+        if not (
+            only_changed
+            and manifest.get(str(image_path(job))) == hashes[str(image_path(job))]
+            and image_path(job).is_file()
+        )
+    ]
+    skipped = len(all_jobs) - len(todo)
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    if progress:
+        progress(skipped, len(all_jobs), skipped)
+
+    if todo:
+        with ProcessPoolExecutor(
+            max_workers=processes or os.cpu_count(), initializer=_init_worker
+        ) as pool:
+            futures = {pool.submit(render, job): job for job in todo}
+            for done, future in enumerate(as_completed(futures), skipped + 1):
+                future.result()
+
+                path = str(image_path(futures[future]))
+                manifest[path] = hashes[path]
+                if progress:
+                    progress(done, len(all_jobs), skipped)
+
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump({path: manifest[path] for path in hashes if path in manifest}, f)
+
+    # Trades count once for every image they're on
+    weights = numpy.zeros(len(trades) + 1)
+    for i, asset in enumerate(assets):
+        for day in range(len(asset.days)):
+            found = trades.between(i, *day_range(asset, day))
+            weights[found.start] += 1
+            weights[found.stop] -= 1
+
+    return trades.totals(numpy.cumsum(weights[:-1]))
@@ -0,0 +1,112 @@
+import math
+from typing import List
+
+import pygame
+
+from . import utils
+from .asset import Asset
+from .chart import Chart
+
+
+# Every asset at a glance: its name, a sparkline of the last `SPAN` seconds, its last
+# price and how much that changed over the sparkline, one row each. The sparklines
+# are charts of their own kept between frames, scrolling along as time passes, so
+# only the columns that came into view since the last frame get drawn. They're
+# plain lines through the price at each column, which is plenty at this size.
+class Watchlist:
+    SPAN = 3600 * 6
+    NAME_WIDTH = 64
+    PRICE_WIDTH = 192
+
+    def __init__(
+        self,
+        assets: List[Asset],
+        sparkline_width=160,
+        row_height=24,
+        fg_color=(255, 255, 255),
+        bg_color=(0, 0, 0, 192),
+        gain_color=(0, 255, 0),
+        loss_color=(255, 0, 0),
+    ):
+        self.assets = assets
+        self.row_height = row_height
+        self.fg_color = fg_color
+        self.bg_color = bg_color
+        self.gain_color = gain_color
+        self.loss_color = loss_color
+
+        self.charts = [
+            Chart(
+                asset.price,
+                sparkline_width,
+                row_height,
+                x_margin=0,
+                y_margin=0,
+                nan_bg_color=(255, 0, 0, 32),
+                axes=False,
+                data_many_lambda=asset.price_many,
+            )
+            for asset in assets
+        ]
+
+        self._column = None  # The last one scales were adjusted at
+
+    def render(self, t: float, selected: int) -> pygame.Surface:
+        # The rows as they are at time `t`, with asset `selected` marked
+        sparkline_width = self.charts[0].width
+        column = math.floor(t * sparkline_width / self.SPAN)
+        moved = column != self._column
+        self._column = column
+
+        width = self.NAME_WIDTH + sparkline_width + self.PRICE_WIDTH
+        surface = pygame.Surface(
+            (width, self.row_height * len(self.assets)), pygame.SRCALPHA
+        )
+        surface.fill(self.bg_color)
+
+        for i, (asset, chart) in enumerate(zip(self.assets, self.charts)):
+            chart.scale_x_min = t - self.SPAN
+            chart.scale_x_max = t
+            # The scale can only need changing once a new column scrolled in
+            if moved:
+                chart.adjust_scale(sticky=True)
+            chart.scroll_chart()
+
+            first = asset.last_price(t - self.SPAN)
+            last = asset.last_price(t)
+            change = last / first - 1
+
+            if math.isnan(last):
+                price_text = "-"
+            elif math.isnan(change):
+                price_text = f"${last:.2f}"
+            else:
+                price_text = f"${last:.2f} {change:+7.2%}"
+
+            name = utils.render(
+                utils.SMALL_FONT,
+                f"{'>' if i == selected else ' '}{asset.pseudonym}",
+                self.fg_color,
+            )
+            price = utils.render(
+                utils.SMALL_FONT,
+                price_text,
+                (
+                    self.gain_color
+                    if change > 0
+                    else self.loss_color if change < 0 else self.fg_color
+                ),
+            )
+
+            y = i * self.row_height
+            surface.blit(name, (0, y + (self.row_height - name.get_height()) / 2))
+            surface.blit(chart.surface, (self.NAME_WIDTH, y))
+            surface.blit(
+                price,
+                (
+                    width - price.get_width(),
+                    y + (self.row_height - price.get_height()) / 2,
+                ),
+            )
+
+        return surface